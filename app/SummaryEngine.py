@@ -1,26 +1,522 @@
 import re
+import os
+import sys
+import json
+import time
+import sqlite3
+import hashlib
+import math
+import shutil
+import threading
+from collections import namedtuple
+from contextlib import closing, contextmanager
 
 from nltk.tokenize import sent_tokenize, word_tokenize
-from nltk import pos_tag
+from nltk import pos_tag_sents
 from nltk.corpus import stopwords
 
 from sumy.parsers.plaintext import PlaintextParser
 from sumy.summarizers.text_rank import TextRankSummarizer
 from sumy.nlp.tokenizers import Tokenizer
 
-from transformers import BartTokenizer, BartForConditionalGeneration
+from transformers import BartTokenizer, BartForConditionalGeneration, StoppingCriteria, StoppingCriteriaList
 
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sentence_transformers import SentenceTransformer
 from sklearn.metrics.pairwise import cosine_similarity
 
 import numpy as np
+import torch
 import warnings
 from transformers import logging
 
 
 warnings.filterwarnings("ignore")
 logging.set_verbosity_error()
+logger = logging.get_logger(__name__)
+
+SUMMARIZATION_ERROR = "An error occurred during summarization."
+
+
+class SummarizationCancelled(Exception):
+    pass
+
+BART_MODEL_NAME = "facebook/bart-large-cnn"
+SENTENCE_MODEL_NAME = "paraphrase-MiniLM-L6-v2"
+
+
+class ModelRegistry:
+    """Process-wide cache of loaded models shared by every pipeline.
+
+    Models are loaded lazily on the first ``acquire`` for a key and kept
+    alive while at least one owner holds a reference.  Unreferenced models
+    stay resident until ``evict`` is called, so a worker that finishes and
+    the next one that starts do not pay the load cost twice.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self._models = {}
+        self._refcounts = {}
+
+    def acquire(self, key, loader):
+        with self._lock:
+            if key in self._models:
+                self._refcounts[key] += 1
+                return self._models[key]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        # Load outside the registry lock so other keys are not blocked,
+        # but serialise loaders of the same key.
+        with load_lock:
+            with self._lock:
+                if key in self._models:
+                    self._refcounts[key] += 1
+                    return self._models[key]
+            model = loader()
+            with self._lock:
+                self._models[key] = model
+                self._refcounts[key] = 1
+            return model
+
+    def release(self, key):
+        with self._lock:
+            if self._refcounts.get(key, 0) > 0:
+                self._refcounts[key] -= 1
+
+    def evict(self, key=None, force=False):
+        """Drop ``key`` (or every key) if unreferenced, or always if ``force``."""
+        with self._lock:
+            keys = [key] if key is not None else list(self._models)
+            evicted = []
+            for k in keys:
+                if k not in self._models:
+                    continue
+                if self._refcounts[k] > 0 and not force:
+                    continue
+                del self._models[k]
+                del self._refcounts[k]
+                self._load_locks.pop(k, None)
+                evicted.append(k)
+            return evicted
+
+    def refcount(self, key):
+        with self._lock:
+            return self._refcounts.get(key, 0)
+
+    def loaded(self):
+        with self._lock:
+            return list(self._models)
+
+
+model_registry = ModelRegistry()
+
+
+class InferenceBackend:
+    """Full-precision PyTorch generation; the reference for the others."""
+
+    name = "torch"
+
+    def load(self, model_name):
+        return BartForConditionalGeneration.from_pretrained(model_name).eval()
+
+
+class QuantizedTorchBackend(InferenceBackend):
+    """PyTorch with every Linear layer dynamically quantized to int8."""
+
+    name = "int8"
+
+    def load(self, model_name):
+        model = super().load(model_name)
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class ExportedGraphBackend(InferenceBackend):
+    """Exported ONNX graph run by onnxruntime (needs optimum[onnxruntime]).
+
+    Exporting BART takes minutes, so the graph is exported once per model
+    and loaded from ``cache_dir`` afterwards.
+    """
+
+    name = "onnx"
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = cache_dir or os.path.join(os.path.expanduser("~"), ".cache", "bel-pdf-summariser", "onnx")
+
+    def export_dir(self, model_name):
+        # Readable for hub names; the hash keeps local paths apart
+        readable = re.sub(r"[^\w.-]+", "--", model_name).strip("-")[-80:]
+        return os.path.join(self.cache_dir, f"{readable}-{text_digest(model_name)[:8]}")
+
+    def load(self, model_name):
+        try:
+            from optimum.onnxruntime import ORTModelForSeq2SeqLM
+        except ImportError as e:
+            raise ImportError("The onnx backend needs optimum: pip install optimum[onnxruntime]") from e
+
+        export_dir = self.export_dir(model_name)
+        if os.path.isdir(export_dir):
+            return ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+
+        logger.info(f"Exporting {model_name} to ONNX, this only happens once...")
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+        # Saved next to its final place and renamed, so another process never
+        # loads a half-written export
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_dir = f"{export_dir}.{os.getpid()}.tmp"
+        model.save_pretrained(tmp_dir)
+        try:
+            os.replace(tmp_dir, export_dir)
+        except OSError:
+            shutil.rmtree(tmp_dir, ignore_errors=True)  # Another process finished first
+        return model
+
+
+INFERENCE_BACKENDS = {
+    backend.name: backend for backend in (InferenceBackend, QuantizedTorchBackend, ExportedGraphBackend)
+}
+
+
+def get_backend(backend):
+    if isinstance(backend, InferenceBackend):
+        return backend
+    if backend not in INFERENCE_BACKENDS:
+        raise ValueError(f"Unknown inference backend '{backend}'. Choose from {', '.join(INFERENCE_BACKENDS)}.")
+    return INFERENCE_BACKENDS[backend]()
+
+
+def acquire_bart(model_name=BART_MODEL_NAME, backend="torch"):
+    backend = get_backend(backend)
+    key = ("bart", model_name, backend.name)
+    model = model_registry.acquire(key, lambda: backend.load(model_name))
+    return key, model
+
+
+def acquire_bart_tokenizer(model_name=BART_MODEL_NAME):
+    key = ("bart-tokenizer", model_name)
+    tokenizer = model_registry.acquire(key, lambda: BartTokenizer.from_pretrained(model_name))
+    return key, tokenizer
+
+
+def acquire_sentence_model(model_name=SENTENCE_MODEL_NAME):
+    key = ("sentence-transformer", model_name)
+    model = model_registry.acquire(key, lambda: SentenceTransformer(model_name))
+    return key, model
+
+
+class SummaryCache:
+    """Persistent LRU cache for pipeline results, backed by SQLite.
+
+    Values are JSON-serialisable and keyed by ``make_key``.  SQLite handles
+    locking between processes; a lock serialises writers within one
+    process.  Once the stored payload exceeds ``max_bytes`` the least
+    recently read entries are evicted.
+    """
+
+    def __init__(self, path=None, max_bytes=256 * 1024 * 1024):
+        if path is None:
+            path = os.path.join(os.path.expanduser("~"), ".cache", "bel-pdf-summariser", "summaries.sqlite3")
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "size INTEGER NOT NULL, accessed REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30)
+
+    @staticmethod
+    def make_key(*parts):
+        return hashlib.sha256(json.dumps(parts).encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        with self._lock, closing(self._connect()) as conn, conn:
+            row = conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (time.time(), key))
+        return json.loads(row[0])
+
+    def set(self, key, value):
+        payload = json.dumps(value)
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, accessed) VALUES (?, ?, ?, ?)",
+                (key, payload, len(payload), time.time()),
+            )
+            self._evict(conn)
+
+    def _evict(self, conn):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        stale = []
+        for key, size in conn.execute("SELECT key, size FROM entries ORDER BY accessed"):
+            if total <= self.max_bytes:
+                break
+            stale.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM entries WHERE key = ?", stale)
+
+    def clear(self):
+        with self._lock, closing(self._connect()) as conn, conn:
+            conn.execute("DELETE FROM entries")
+
+
+def text_digest(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def peak_rss_bytes():
+    # Lifetime peak resident set size of this process, or None when neither
+    # the resource module (POSIX) nor psutil is available.
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+    except ImportError:
+        return None
+    memory = psutil.Process().memory_info()
+    return getattr(memory, "peak_wset", memory.rss)
+
+
+def current_rss_bytes():
+    # Current resident set size, or None when it cannot be read
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm", "rb") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+class PipelineProfiler:
+    """Records stage timings and counters for one summarization run.
+
+    A disabled profiler accepts the same calls and records nothing, so
+    components can be instrumented unconditionally.
+    """
+
+    # Resident memory is polled on a background thread while the run is
+    # live, so the report holds the peak of this run rather than the
+    # lifetime peak of the process.
+    rss_interval = 0.05
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.events = []
+        self.counters = {}
+        self.started = time.perf_counter()
+        self.peak_rss = None
+        self._stop_sampling = threading.Event()
+        self._sampler = None
+        if enabled and current_rss_bytes() is not None:
+            self._sample_rss()
+            self._sampler = threading.Thread(target=self._poll_rss, name="rss-sampler", daemon=True)
+            self._sampler.start()
+
+    def _sample_rss(self):
+        rss = current_rss_bytes()
+        if rss is not None and (self.peak_rss is None or rss > self.peak_rss):
+            self.peak_rss = rss
+
+    def _poll_rss(self):
+        while not self._stop_sampling.wait(self.rss_interval):
+            self._sample_rss()
+
+    @contextmanager
+    def stage(self, name, **args):
+        if not self.enabled:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.events.append((name, start, time.perf_counter() - start, threading.get_ident(), args))
+            if self._sampler is not None:
+                self._sample_rss()
+
+    def timed_iter(self, iterable, name):
+        # Charges the time spent producing each item (page decoding,
+        # sectioning, chunking) to one stage of the consumer.
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def finish(self):
+        self._stop_sampling.set()
+        if self._sampler is not None:
+            self._sampler.join()
+            self._sample_rss()
+        return ProfileReport(self.events, self.counters, time.perf_counter() - self.started,
+                             self.peak_rss, self.started,
+                             peak_rss_bytes() if self.enabled else None)
+
+
+class ProfileReport:
+    def __init__(self, events, counters, total_seconds, peak_rss, origin, process_peak_rss=None):
+        self.events = events
+        self.counters = dict(counters)
+        self.total_seconds = total_seconds
+        # peak_rss is the sampled peak during this run; process_peak_rss the
+        # lifetime peak of the process, which earlier runs may have set.
+        self.peak_rss = peak_rss
+        self.process_peak_rss = process_peak_rss
+        self.origin = origin
+
+    @property
+    def stages(self):
+        stages = {}
+        for name, _, duration, _, _ in self.events:
+            stage = stages.setdefault(name, {"seconds": 0.0, "calls": 0})
+            stage["seconds"] += duration
+            stage["calls"] += 1
+        return stages
+
+    def as_dict(self):
+        return {
+            "total_seconds": round(self.total_seconds, 3),
+            "peak_rss_mb": round(self.peak_rss / 2**20, 1) if self.peak_rss is not None else None,
+            "process_peak_rss_mb": (round(self.process_peak_rss / 2**20, 1)
+                                    if self.process_peak_rss is not None else None),
+            "stages": {name: {"seconds": round(stage["seconds"], 3), "calls": stage["calls"]}
+                       for name, stage in self.stages.items()},
+            "counters": self.counters,
+        }
+
+    def format(self):
+        lines = [f"Summarization took {self.total_seconds:.2f}s"]
+        for name, stage in sorted(self.stages.items(), key=lambda item: -item[1]["seconds"]):
+            lines.append(f"  {name:<20} {stage['seconds']:8.2f}s  {stage['calls']:6d} calls")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  {name:<20} {value:>9}")
+        if self.peak_rss is not None:
+            lines.append(f"  {'peak_rss_mb':<20} {self.peak_rss / 2**20:9.1f}")
+        if self.process_peak_rss is not None:
+            lines.append(f"  {'process_peak_rss_mb':<20} {self.process_peak_rss / 2**20:9.1f}")
+        return "\n".join(lines)
+
+    def write_chrome_trace(self, path):
+        # Trace Event Format, viewable in chrome://tracing or Perfetto
+        pid = os.getpid()
+        trace_events = [{
+            "name": name,
+            "cat": "pipeline",
+            "ph": "X",
+            "ts": round((start - self.origin) * 1e6, 1),
+            "dur": round(duration * 1e6, 1),
+            "pid": pid,
+            "tid": tid,
+            "args": args,
+        } for name, start, duration, tid, args in self.events]
+        with open(path, "w", encoding="utf-8") as trace_file:
+            json.dump({"traceEvents": trace_events, "displayTimeUnit": "ms",
+                       "otherData": self.as_dict()}, trace_file)
+
+
+SummaryProgress = namedtuple(
+    "SummaryProgress", ["stage", "sections_done", "sections_total", "generate_calls", "eta_seconds"]
+)
+
+
+class ProgressMonitor:
+    """Cooperative cancellation and progress reporting for one run.
+
+    Work is counted in generation items (sections, or merged groups in
+    hierarchical mode) and in their token budgets.  The ETA divides the
+    remaining budget by the token throughput measured so far.
+    """
+
+    def __init__(self, callback=None, cancel_event=None):
+        self.callback = callback
+        self.cancel_event = cancel_event
+        self.stage = "reading"
+        self.items_total = 0
+        self.items_done = 0
+        self.tokens_total = 0
+        self.tokens_done = 0
+        self.generate_calls = 0
+        self.generate_seconds = 0.0
+
+    @property
+    def cancelled(self):
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    def check(self):
+        if self.cancelled:
+            raise SummarizationCancelled("Summarization was cancelled.")
+
+    def stopping_criteria(self):
+        # Lets a cancel request end generate() at the next decoding step
+        if self.cancel_event is None:
+            return None
+        return StoppingCriteriaList([CancelCriteria(self.cancel_event)])
+
+    def set_stage(self, stage):
+        self.check()
+        self.stage = stage
+        self.report()
+
+    def add_work(self, items, tokens):
+        self.items_total += items
+        self.tokens_total += tokens
+
+    def generated(self, items, tokens, seconds):
+        self.generate_calls += 1
+        self.generate_seconds += seconds
+        self.items_done += items
+        self.tokens_done += tokens
+        self.report()
+        self.check()
+
+    @property
+    def eta_seconds(self):
+        if not self.tokens_done:
+            return None
+        return (self.tokens_total - self.tokens_done) * self.generate_seconds / self.tokens_done
+
+    def report(self):
+        if self.callback is not None:
+            self.callback(SummaryProgress(self.stage, self.items_done, self.items_total,
+                                          self.generate_calls, self.eta_seconds))
+
+
+class CancelCriteria(StoppingCriteria):
+    def __init__(self, cancel_event):
+        self.cancel_event = cancel_event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.cancel_event.is_set()
+
+
+SECTION_BREAK_PATTERN = re.compile(r'\n(?=[A-Z][A-Z\s]+:?|\d+\.?\s+[A-Z])')
+
 
 class ImprovedPreprocessor:
     @staticmethod
@@ -32,17 +528,150 @@ class ImprovedPreprocessor:
             X = vectorizer.fit_transform(paragraphs)
             feature_names = vectorizer.get_feature_names_out()
 
-        sections = re.split(r'\n(?=[A-Z][A-Z\s]+:?|\d+\.?\s+[A-Z])', text)
-        processed_sections = []
-        for section in sections:
-            match = re.match(r'((?:[A-Z][A-Z\s]+:?|\d+\.?\s+[A-Z][^\n]+))(.*)', section, re.DOTALL)
-            if match:
-                heading, content = match.groups()
-                processed_sections.append((heading.strip(), content.strip()))
-            else:
-                processed_sections.append(("", section.strip()))
-        return processed_sections
-    
+        sections = re.split(SECTION_BREAK_PATTERN, text)
+        return [ImprovedPreprocessor.split_heading(section) for section in sections]
+
+    @staticmethod
+    def iter_sections(pieces):
+        # Yields (heading, content, content_offset) where the offset points
+        # into the concatenation of all pieces.  Only the trailing section
+        # is buffered between pieces.
+        buffer = ""
+        buffer_offset = 0
+        for piece in pieces:
+            buffer += piece
+            starts = [0] + [match.end() for match in SECTION_BREAK_PATTERN.finditer(buffer)]
+            ends = [match.start() for match in SECTION_BREAK_PATTERN.finditer(buffer)]
+            for section_start, section_end in zip(starts, ends):
+                yield ImprovedPreprocessor._locate_section(buffer, section_start, section_end, buffer_offset)
+            buffer = buffer[starts[-1]:]
+            buffer_offset += starts[-1]
+        if buffer:
+            yield ImprovedPreprocessor._locate_section(buffer, 0, len(buffer), buffer_offset)
+
+    @staticmethod
+    def _locate_section(buffer, start, end, buffer_offset):
+        heading, content = ImprovedPreprocessor.split_heading(buffer[start:end])
+        content_offset = buffer.rfind(content, start, end) if content else end
+        return heading, content, buffer_offset + content_offset
+
+    @staticmethod
+    def split_heading(section):
+        match = re.match(r'((?:[A-Z][A-Z\s]+:?|\d+\.?\s+[A-Z][^\n]+))(.*)', section, re.DOTALL)
+        if match:
+            heading, content = match.groups()
+            return heading.strip(), content.strip()
+        return "", section.strip()
+
+
+Chunk = namedtuple("Chunk", ["heading", "text", "start", "end", "n_tokens"])
+
+
+class TokenAwareChunker:
+    """Packs sentences into chunks sized for the model's context window.
+
+    Headings still start new chunks, but neighbouring sections smaller than
+    ``min_tokens`` are merged while they fit, and sections longer than
+    ``max_tokens`` are split on sentence boundaries instead of being
+    truncated by the tokenizer.  Token counts come from the model's own
+    tokenizer.  Each chunk records the character span it covers in the
+    source text.
+    """
+
+    def __init__(self, tokenizer, max_tokens=None, min_tokens=256, overlap_tokens=0):
+        self.tokenizer = tokenizer
+        # Leave room for the special tokens the tokenizer adds around input
+        self.max_tokens = max_tokens or min(tokenizer.model_max_length, 1024) - 2
+        self.min_tokens = min_tokens
+        self.overlap_tokens = overlap_tokens
+
+    def count_tokens(self, texts):
+        if not texts:
+            return []
+        encoded = self.tokenizer(list(texts), add_special_tokens=False)["input_ids"]
+        return [len(ids) for ids in encoded]
+
+    def chunk(self, text):
+        return list(self.chunk_sections(ImprovedPreprocessor.iter_sections([text])))
+
+    def chunk_sections(self, sections):
+        pending = None
+        for heading, content, offset in sections:
+            for chunk in self._chunk_section(heading, content, offset):
+                if pending is None:
+                    pending = chunk
+                elif (min(pending.n_tokens, chunk.n_tokens) < self.min_tokens
+                      and pending.n_tokens + chunk.n_tokens <= self.max_tokens):
+                    pending = self._merge(pending, chunk)
+                else:
+                    yield pending
+                    pending = chunk
+        if pending is not None:
+            yield pending
+
+    @staticmethod
+    def _merge(first, second):
+        headings = [heading for heading in (first.heading, second.heading) if heading]
+        heading = first.heading if first.heading == second.heading else " / ".join(headings)
+        return Chunk(heading, f"{first.text}\n\n{second.text}", first.start, second.end,
+                     first.n_tokens + second.n_tokens)
+
+    def _sentence_spans(self, content, offset):
+        spans = []
+        cursor = 0
+        for sentence in sent_tokenize(content):
+            start = content.find(sentence, cursor)
+            if start < 0:
+                start = cursor
+            cursor = start + len(sentence)
+            spans.append((offset + start, offset + cursor, sentence))
+        return spans
+
+    def _chunk_section(self, heading, content, offset):
+        spans = []
+        for start, end, sentence in self._sentence_spans(content, offset):
+            spans.extend(self._split_long_sentence(start, end, sentence))
+        if not spans:
+            return
+        token_counts = self.count_tokens([sentence for _, _, sentence in spans])
+
+        def make_chunk(first, last):
+            start, end = spans[first][0], spans[last][1]
+            return Chunk(heading, content[start - offset:end - offset], start, end,
+                         sum(token_counts[first:last + 1]))
+
+        first = 0
+        used = 0
+        for index, count in enumerate(token_counts):
+            if index > first and used + count > self.max_tokens:
+                yield make_chunk(first, index - 1)
+                # Carry trailing sentences over as context for the next chunk
+                overlap_start, overlap = index, 0
+                while (overlap_start - 1 > first
+                       and overlap + token_counts[overlap_start - 1] <= self.overlap_tokens
+                       and overlap + token_counts[overlap_start - 1] + count <= self.max_tokens):
+                    overlap_start -= 1
+                    overlap += token_counts[overlap_start]
+                first, used = overlap_start, overlap
+            used += count
+        yield make_chunk(first, len(spans) - 1)
+
+    def _split_long_sentence(self, start, end, sentence):
+        # A single sentence over budget is cut into roughly equal word runs
+        n_tokens = self.count_tokens([sentence])[0]
+        if n_tokens <= self.max_tokens:
+            return [(start, end, sentence)]
+        words = list(re.finditer(r'\S+', sentence))
+        n_pieces = math.ceil(n_tokens / self.max_tokens) + 1
+        per_piece = math.ceil(len(words) / n_pieces)
+        pieces = []
+        for i in range(0, len(words), per_piece):
+            piece_start = words[i].start()
+            piece_end = words[min(i + per_piece, len(words)) - 1].end()
+            pieces.append((start + piece_start, start + piece_end, sentence[piece_start:piece_end]))
+        return pieces
+
+
 class ImprovedExtractiveSummarizer:
     def __init__(self):
         self.summarizer = TextRankSummarizer()
@@ -54,34 +683,96 @@ class ImprovedExtractiveSummarizer:
         return [str(sentence) for sentence in summary]
 
 class ImprovedAbstractiveSummarizer:
-    def __init__(self):
-        self.model = BartForConditionalGeneration.from_pretrained("facebook/bart-large-cnn")
-        self.tokenizer = BartTokenizer.from_pretrained("facebook/bart-large-cnn")
+    def __init__(self, model_name=BART_MODEL_NAME, backend="torch"):
+        self.model_name = model_name
+        self.backend = get_backend(backend)
+        self._model_key, self.model = acquire_bart(model_name, self.backend)
+        self._tokenizer_key, self.tokenizer = acquire_bart_tokenizer(model_name)
+        self.profiler = PipelineProfiler(enabled=False)
+        self.monitor = ProgressMonitor()
+
+    def close(self):
+        if self.model is not None:
+            model_registry.release(self._model_key)
+            model_registry.release(self._tokenizer_key)
+            self.model = None
+            self.tokenizer = None
 
     def summarize(self, text, max_length, min_length, tech_terms=None):
-        inputs = self.tokenizer(text, return_tensors="pt", max_length=1024, truncation=True)
-        
-        if tech_terms:
+        return self.summarize_batch([text], [max_length], [min_length], [tech_terms])[0]
+
+    def summarize_batch(self, texts, max_lengths, min_lengths, tech_terms=None,
+                        batch_size=8, length_tolerance=1.25):
+        # Items with similar length budgets are bucketed together so that one
+        # padded generate call can serve the whole bucket.  A bucket uses the
+        # smallest budget of its members, so no item exceeds its own max_length;
+        # in exchange a member can lose up to 1 - 1/length_tolerance of its
+        # budget (20% at the default of 1.25).
+        if tech_terms is None:
+            tech_terms = [None] * len(texts)
+        self.monitor.add_work(len(texts), sum(max_lengths))
+        order = sorted(range(len(texts)), key=lambda i: max_lengths[i])
+        summaries = [None] * len(texts)
+
+        bucket = []
+        for index in order:
+            if bucket and (len(bucket) >= batch_size
+                           or max_lengths[index] > max_lengths[bucket[0]] * length_tolerance):
+                self._generate_bucket(bucket, texts, max_lengths, min_lengths, tech_terms, summaries)
+                bucket = []
+            bucket.append(index)
+        if bucket:
+            self._generate_bucket(bucket, texts, max_lengths, min_lengths, tech_terms, summaries)
+
+        return summaries
+
+    def _generate_bucket(self, bucket, texts, max_lengths, min_lengths, tech_terms, summaries):
+        max_length = min(max_lengths[i] for i in bucket)
+        min_length = min(min(min_lengths[i] for i in bucket), max_length)
+
+        inputs = self.tokenizer([texts[i] for i in bucket], return_tensors="pt", max_length=1024,
+                                truncation=True, padding=True)
+
+        if any(tech_terms[i] for i in bucket):
             attention_mask = inputs['attention_mask'].clone()
-            for term in tech_terms:
-                term_ids = self.tokenizer.encode(term, add_special_tokens=False)
-                for i in range(len(inputs['input_ids'][0]) - len(term_ids) + 1):
-                    if inputs['input_ids'][0][i:i+len(term_ids)].tolist() == term_ids:
-                        attention_mask[0][i:i+len(term_ids)] = 2  
+            for row, index in enumerate(bucket):
+                for term in tech_terms[index] or []:
+                    term_ids = self.tokenizer.encode(term, add_special_tokens=False)
+                    self._emphasize_term(inputs['input_ids'][row], attention_mask[row], term_ids)
             inputs['attention_mask'] = attention_mask
 
-        summary_ids = self.model.generate(
+        input_tokens = int(inputs['input_ids'].ne(self.tokenizer.pad_token_id).sum())
+        self.monitor.check()
+        start = time.perf_counter()
+        with self.profiler.stage("generate", batch=len(bucket), max_length=max_length), torch.inference_mode():
+            summary_ids = self._generate(inputs, max_length, min_length)
+        self.monitor.generated(len(bucket), sum(max_lengths[i] for i in bucket), time.perf_counter() - start)
+        self.profiler.count("generate_calls")
+        self.profiler.count("input_tokens", input_tokens)
+        self.profiler.count("output_tokens", int(summary_ids.ne(self.tokenizer.pad_token_id).sum()))
+        decoded = self.tokenizer.batch_decode(summary_ids, skip_special_tokens=True)
+        for index, summary in zip(bucket, decoded):
+            summaries[index] = summary
+
+    def _generate(self, inputs, max_length, min_length):
+        return self.model.generate(
             inputs['input_ids'],
             attention_mask=inputs['attention_mask'],
             max_length=max_length,
             min_length=min_length,
             length_penalty=2.0,
             num_beams=4,
-            early_stopping=True
+            early_stopping=True,
+            stopping_criteria=self.monitor.stopping_criteria()
         )
-        summary = self.tokenizer.decode(summary_ids[0], skip_special_tokens=True)
-        
-        return summary
+
+    @staticmethod
+    def _emphasize_term(input_ids, attention_mask, term_ids):
+        if not term_ids:
+            return
+        for i in range(len(input_ids) - len(term_ids) + 1):
+            if input_ids[i:i+len(term_ids)].tolist() == term_ids:
+                attention_mask[i:i+len(term_ids)] = 2
 
     def highlight_term(self, input_ids, term_ids):
         # Increase attention weight for technical terms
@@ -95,85 +786,186 @@ class ImprovedTechnicalTermExtractor:
         self.vectorizer = TfidfVectorizer(stop_words='english', ngram_range=(1, 3), max_df=1.0, min_df=1)
 
     def extract(self, text):
+        return self.extract_document([text])[0]
+
+    def extract_document(self, texts, candidates=50, top_n=15):
+        # One fit over every section of the document, so IDF actually
+        # separates section-specific terms from document-wide vocabulary.
         try:
-            tfidf_matrix = self.vectorizer.fit_transform([text])
-            feature_names = self.vectorizer.get_feature_names_out()
-            tfidf_scores = tfidf_matrix.toarray()[0]
-            
-            tech_terms = sorted(zip(feature_names, tfidf_scores), key=lambda x: x[1], reverse=True)
-            
-            filtered_terms = self.filter_terms([term for term, score in tech_terms[:50]])
-            
-            return filtered_terms[:15]  # Return top 15 filtered terms
-        except ValueError:
-            return self.extract_fallback(text)
+            tfidf_matrix = self.vectorizer.fit_transform(texts).tocsr()
+        except ValueError:  # Empty vocabulary
+            return [[] for _ in texts]
+        tfidf_matrix.sort_indices()
+        feature_names = self.vectorizer.get_feature_names_out()
+
+        candidate_terms = []
+        for row in range(tfidf_matrix.shape[0]):
+            start, end = tfidf_matrix.indptr[row], tfidf_matrix.indptr[row + 1]
+            scores = tfidf_matrix.data[start:end]
+            indices = tfidf_matrix.indices[start:end]
+            if len(scores) > candidates:
+                top = np.argpartition(-scores, candidates - 1)[:candidates]
+                top = np.sort(top)
+            else:
+                top = np.arange(len(scores))
+            top = top[np.argsort(-scores[top], kind="stable")]
+            candidate_terms.append([feature_names[i] for i in indices[top]])
+
+        nouns = set(self.filter_terms({term for terms in candidate_terms for term in terms}))
+        return [[term for term in terms if term in nouns][:top_n] for terms in candidate_terms]
 
     def filter_terms(self, terms):
+        terms = list(terms)
+        # Tag every single-word candidate in one call; each term is tagged
+        # as its own sentence, exactly as tagging them one by one would.
+        single_words = [term for term in terms if len(term.split()) == 1 and not term.isupper()]
+        tags = {term: tagged[0][1] for term, tagged in zip(single_words, pos_tag_sents([[term] for term in single_words]))}
+
         filtered = []
         for term in terms:
             if len(term.split()) > 1:  # Multi-word term
                 filtered.append(term)
             elif term.isupper():  # Acronym
                 filtered.append(term)
-            else:
-                pos = pos_tag([term])[0][1]
-                if pos.startswith('NN'):  # Noun
-                    filtered.append(term)
+            elif tags[term].startswith('NN'):  # Noun
+                filtered.append(term)
         return filtered
 
+class SentenceEmbeddingStore:
+    """Sentence embeddings keyed by sentence hash, shared by every stage.
+
+    Each distinct sentence is encoded once; later lookups reuse the stored
+    vector.  The pipeline clears the store between documents.
+    """
+
+    def __init__(self, model_name=SENTENCE_MODEL_NAME, batch_size=32):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.sentence_model = None
+        self._model_key = None
+        self._vectors = {}
+
+    def load(self):
+        if self.sentence_model is None:
+            self._model_key, self.sentence_model = acquire_sentence_model(self.model_name)
+        return self.sentence_model
+
+    def close(self):
+        if self.sentence_model is not None:
+            model_registry.release(self._model_key)
+            self.sentence_model = None
+        self._vectors.clear()
+
+    def clear(self):
+        self._vectors.clear()
+
+    def __len__(self):
+        return len(self._vectors)
+
+    @staticmethod
+    def _key(sentence):
+        return hashlib.sha1(sentence.encode("utf-8")).digest()
+
+    def encode(self, sentences):
+        keys = [self._key(sentence) for sentence in sentences]
+        missing = {}
+        for key, sentence in zip(keys, sentences):
+            if key not in self._vectors and key not in missing:
+                missing[key] = sentence
+        if missing:
+            vectors = self.load().encode(list(missing.values()), batch_size=self.batch_size)
+            self._vectors.update(zip(missing.keys(), vectors))
+        if not keys:
+            return np.empty((0, 0))
+        return np.array([self._vectors[key] for key in keys])
+
+
 class ImprovedFactChecker:
-    def __init__(self):
+    def __init__(self, model_name=SENTENCE_MODEL_NAME, embedding_store=None, block_size=1024):
+        self.block_size = block_size
+        self._owns_store = embedding_store is None
+        # An empty store is falsy, so test for None explicitly
+        self.embedding_store = embedding_store if embedding_store is not None else SentenceEmbeddingStore(model_name)
         self.sentence_model = None
         try:
-            from sentence_transformers import SentenceTransformer
-            self.sentence_model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
+            self.sentence_model = self.embedding_store.load()
         except ImportError:
-            logging.warning("SentenceTransformer not available. Using fallback method.")
+            logger.warning("SentenceTransformer not available. Using fallback method.")
         except Exception as e:
-            logging.error(f"Error initializing SentenceTransformer: {str(e)}")
+            logger.error(f"Error initializing SentenceTransformer: {str(e)}")
 
+    def close(self):
+        if self._owns_store:
+            self.embedding_store.close()
+        self.sentence_model = None
 
-    def verify(self, summary, original_content):
+    def verify(self, summary, original_content, max_words=None):
         try:
             summary_sentences = sent_tokenize(summary)
             original_sentences = sent_tokenize(original_content)
             
             if self.sentence_model:
-                return self._verify_with_transformer(summary_sentences, original_sentences)
+                return self._verify_with_transformer(summary_sentences, original_sentences, max_words)
             else:
-                return self._verify_with_tfidf(summary_sentences, original_sentences)
+                return self._verify_with_tfidf(summary_sentences, original_sentences, max_words)
         except Exception as e:
-            logging.error(f"Error in verification process: {str(e)}")
+            logger.error(f"Error in verification process: {str(e)}")
             return summary  
         
-    def _verify_with_transformer(self, summary_sentences, original_sentences):
-        summary_embeddings = self.sentence_model.encode(summary_sentences)
-        original_embeddings = self.sentence_model.encode(original_sentences)
-        
-        similarity_matrix = cosine_similarity(summary_embeddings, original_embeddings)
+    def _verify_with_transformer(self, summary_sentences, original_sentences, max_words=None):
+        summary_embeddings = self.embedding_store.encode(summary_sentences)
+        original_embeddings = self.embedding_store.encode(original_sentences)
         
-        verified_summary = summary_sentences.copy()
-        for i, orig_sentence in enumerate(original_sentences):
-            if not any(similarity_matrix[j][i] > 0.7 for j in range(len(summary_sentences))):
-                verified_summary.append(orig_sentence)
-        
-        return ' '.join(verified_summary)
+        uncovered = self.uncovered_mask(summary_embeddings, original_embeddings, 0.7, self.block_size)
+        return self._join_verified(summary_sentences, original_sentences, uncovered, max_words)
 
-    def _verify_with_tfidf(self, summary_sentences, original_sentences):
+    def _verify_with_tfidf(self, summary_sentences, original_sentences, max_words=None):
         vectorizer = TfidfVectorizer()
         all_sentences = summary_sentences + original_sentences
-        tfidf_matrix = vectorizer.fit_transform(all_sentences)
-        
-        similarity_matrix = cosine_similarity(tfidf_matrix[:len(summary_sentences)], tfidf_matrix[len(summary_sentences):])
+        tfidf_matrix = vectorizer.fit_transform(all_sentences).tocsr()
         
-        verified_summary = summary_sentences.copy()
-        for i, orig_sentence in enumerate(original_sentences):
-            if not any(similarity_matrix[j][i] > 0.3 for j in range(len(summary_sentences))):
-                verified_summary.append(orig_sentence)
-        
-        return ' '.join(verified_summary)
+        uncovered = self.uncovered_mask(tfidf_matrix[:len(summary_sentences)], tfidf_matrix[len(summary_sentences):],
+                                        0.3, self.block_size)
+        return self._join_verified(summary_sentences, original_sentences, uncovered, max_words)
+
+    @staticmethod
+    def uncovered_mask(summary_vectors, original_vectors, threshold, block_size=None):
+        # An original sentence is covered when its best match among the
+        # summary sentences exceeds the threshold.  Columns are processed in
+        # blocks so the full similarity matrix never has to exist at once.
+        n_original = original_vectors.shape[0]
+        if summary_vectors.shape[0] == 0:
+            return np.ones(n_original, dtype=bool)
+        block_size = block_size or n_original
+        best = np.empty(n_original)
+        for start in range(0, n_original, block_size):
+            block = cosine_similarity(summary_vectors, original_vectors[start:start + block_size])
+            best[start:start + block_size] = block.max(axis=0)
+        return best <= threshold
+
+    @staticmethod
+    def _join_verified(summary_sentences, original_sentences, uncovered, max_words=None):
+        # Uncovered source sentences are appended in document order.  With a
+        # word budget, only those that still fit are added, so verification
+        # never pushes a summary past its length budget.
+        verified = list(summary_sentences)
+        words = sum(len(sentence.split()) for sentence in verified)
+        for sentence, keep in zip(original_sentences, uncovered):
+            sentence_words = len(sentence.split())
+            if keep and (max_words is None or words + sentence_words <= max_words):
+                verified.append(sentence)
+                words += sentence_words
+        return ' '.join(verified)
 
 class ImprovedPostprocessor:
+    def __init__(self, model_name=SENTENCE_MODEL_NAME, embedding_store=None):
+        self._owns_store = embedding_store is None
+        self.embedding_store = embedding_store if embedding_store is not None else SentenceEmbeddingStore(model_name)
+
+    def close(self):
+        if self._owns_store:
+            self.embedding_store.close()
+
     def format_summary(self, sections):
         formatted_summary = ["Document Summary\n"]
         
@@ -208,9 +1000,7 @@ class ImprovedPostprocessor:
     def extract_key_takeaways(self, sections):
         all_content = " ".join(content for _, content in sections)
         sentences = sent_tokenize(all_content)
-        sentence_model = SentenceTransformer('paraphrase-MiniLM-L6-v2')
-        
-        embeddings = sentence_model.encode(sentences)
+        embeddings = self.embedding_store.encode(sentences)
         centroid = np.mean(embeddings, axis=0)
         
         similarities = cosine_similarity([centroid], embeddings)[0]
@@ -219,47 +1009,275 @@ class ImprovedPostprocessor:
         return [sentences[i] for i in top_indices]
 
 class SummarizationPipeline:
-    def __init__(self):
+    def __init__(self, bart_model=BART_MODEL_NAME, sentence_model=SENTENCE_MODEL_NAME, cache=None,
+                 encode_batch_size=32, backend="torch", chunker_options=None):
+        self.bart_model = bart_model
+        self.backend = get_backend(backend)
+        self.sentence_model = sentence_model
+        self.cache = cache
+        self.embedding_store = SentenceEmbeddingStore(sentence_model, batch_size=encode_batch_size)
         self.preprocessor = ImprovedPreprocessor()
         self.extractive_summarizer = ImprovedExtractiveSummarizer()
-        self.abstractive_summarizer = ImprovedAbstractiveSummarizer()
+        self.abstractive_summarizer = ImprovedAbstractiveSummarizer(bart_model, self.backend)
         self.technical_term_extractor = ImprovedTechnicalTermExtractor()
-        self.fact_checker = ImprovedFactChecker()
-        self.postprocessor = ImprovedPostprocessor()
+        self.fact_checker = ImprovedFactChecker(sentence_model, self.embedding_store)
+        self.postprocessor = ImprovedPostprocessor(sentence_model, self.embedding_store)
+        self.chunker = TokenAwareChunker(self.abstractive_summarizer.tokenizer, **(chunker_options or {}))
+        self.last_chunks = []
+        self.profiler = PipelineProfiler(enabled=False)
+        self.monitor = ProgressMonitor()
+        self.last_report = None
 
-    def summarize(self, text, target_length='medium'):
+    def close(self):
+        # Hand the shared models back to the registry; they stay loaded for
+        # the next pipeline until model_registry.evict() is called.
+        self.abstractive_summarizer.close()
+        self.fact_checker.close()
+        self.postprocessor.close()
+        self.embedding_store.close()
+
+    def summarize(self, text, target_length='medium', mode='sections', progress=None, cancel_event=None):
+        # mode='hierarchical' summarizes chunks and merges the summaries
+        # recursively, for documents far beyond the model's context.
+        # progress is called with a SummaryProgress after every stage and
+        # generate call; setting cancel_event raises SummarizationCancelled.
+        summarize_chunks = self._summarize_mode(mode)
+        self._start_run(progress, cancel_event)
         try:
-            sections = self.preprocessor.preprocess_text(text)
-            total_words = sum(len(word_tokenize(content)) for _, content in sections)
-        
-            target_word_counts = {
-                'short': min(500, max(250, total_words // 10)),
-                'medium': min(1000, max(500, total_words // 5)),
-                'long': min(2000, max(1000, total_words // 3))
-            }
-            
-            target_words = target_word_counts[target_length]
-            words_per_section = max(50, target_words // len(sections)) if sections else target_words
-            
-            summarized_sections = []
-            for section_name, section_content in sections:
-                if not section_content.strip():
-                    continue
-                importance_score = self.calculate_importance(section_content)
-                section_word_count = int(words_per_section * importance_score)
-                
-                summarized_section = self.summarize_section(section_content, section_word_count)
-                summarized_sections.append((section_name, summarized_section))
-            
-            if not summarized_sections:
-                return "The input text does not contain any content to summarize."
-            
-            summarized_sections = self.adjust_section_lengths(summarized_sections, target_words)
-            
-            return self.postprocessor.format_summary(summarized_sections)
+            sections = self.preprocessor.iter_sections([text])
+            return summarize_chunks(self._chunk_sections(sections), target_length)
+        except SummarizationCancelled:
+            raise
         except Exception as e:
-            logging.error(f"Error in summarization process: {str(e)}")
-            return "An error occurred during summarization."
+            logger.error(f"Error in summarization process: {str(e)}")
+            return SUMMARIZATION_ERROR
+        finally:
+            self._finish_run()
+
+    def summarize_pages(self, pages, target_length='medium', mode='sections', progress=None, cancel_event=None,
+                        preprocess=None):
+        # pages is an iterable of (page_number, text), e.g. FileChecker.iter_pages().
+        # Sections are prepared while later pages are still being decoded.
+        # preprocess (e.g. TextPreprocessor.preprocess) is applied to each
+        # page as it arrives, as callers of summarize apply it to the whole
+        # text.  Errors raised by the page source (validation failures) propagate.
+        summarize_chunks = self._summarize_mode(mode)
+        source_errors = []
+
+        def guarded(pages):
+            try:
+                yield from pages
+            except Exception as e:
+                source_errors.append(e)
+                raise
+
+        self._start_run(progress, cancel_event)
+        try:
+            pieces = (f"{self._preprocess_page(preprocess, page_text)}\n\n"
+                      for _, page_text in self.profiler.timed_iter(guarded(pages), "extraction"))
+            sections = self.preprocessor.iter_sections(pieces)
+            return summarize_chunks(self._chunk_sections(sections), target_length)
+        except SummarizationCancelled:
+            raise
+        except Exception as e:
+            if source_errors:
+                raise
+            logger.error(f"Error in summarization process: {str(e)}")
+            return SUMMARIZATION_ERROR
+        finally:
+            self._finish_run()
+
+    def _preprocess_page(self, preprocess, text):
+        if preprocess is None:
+            return text
+        with self.profiler.stage("preprocess"):
+            return preprocess(text)
+
+    def _start_run(self, progress=None, cancel_event=None):
+        self.profiler = PipelineProfiler()
+        self.monitor = ProgressMonitor(progress, cancel_event)
+        self.abstractive_summarizer.profiler = self.profiler
+        self.abstractive_summarizer.monitor = self.monitor
+
+    def _finish_run(self):
+        # The profile of the latest run stays available as last_report
+        self.last_report = self.profiler.finish()
+        self.profiler = PipelineProfiler(enabled=False)
+        self.monitor = ProgressMonitor()
+        self.abstractive_summarizer.profiler = self.profiler
+        self.abstractive_summarizer.monitor = self.monitor
+
+    def _summarize_mode(self, mode):
+        modes = {'sections': self._summarize, 'hierarchical': self._summarize_hierarchical}
+        if mode not in modes:
+            raise ValueError(f"Unknown summarization mode '{mode}'. Choose from {', '.join(modes)}.")
+        return modes[mode]
+
+    def target_word_count(self, total_words, target_length):
+        target_word_counts = {
+            'short': min(500, max(250, total_words // 10)),
+            'medium': min(1000, max(500, total_words // 5)),
+            'long': min(2000, max(1000, total_words // 3))
+        }
+        return target_word_counts[target_length]
+
+    def _chunk_sections(self, sections):
+        # Chunks replace the raw heading sections; their spans are kept in
+        # last_chunks so summaries can be mapped back to the source text.
+        self.last_chunks = []
+        for chunk in self.profiler.timed_iter(self.chunker.chunk_sections(sections), "sectioning"):
+            self.last_chunks.append(chunk)
+            yield chunk.heading, chunk.text
+
+    def _summarize(self, sections, target_length):
+        section_count = 0
+        total_words = 0
+        document_hash = hashlib.sha256()
+        names, contents, importances, key_sentences = [], [], [], []
+        profiler = self.profiler
+        self.monitor.set_stage("reading")
+        for section_name, section_content in sections:
+            self.monitor.check()
+            section_count += 1
+            total_words += len(word_tokenize(section_content))
+            document_hash.update(json.dumps([section_name, section_content]).encode("utf-8"))
+            if not section_content.strip():
+                continue
+            names.append(section_name)
+            contents.append(section_content)
+            with profiler.stage("importance"):
+                importances.append(self.calculate_importance(section_content))
+            with profiler.stage("textrank"):
+                key_sentences.append(self.extract_key_sentences(section_content))
+        profiler.count("sections", len(contents))
+        profiler.count("input_words", total_words)
+
+        summary_key = self._cache_key("summary", document_hash.hexdigest(), target_length)
+        cached_summary = self._cache_get(summary_key)
+        if cached_summary is not None:
+            profiler.count("summary_cache_hits")
+            return cached_summary
+
+        # Technical terms need the whole document, so they are extracted
+        # once all sections have arrived.
+        self.monitor.set_stage("preparing")
+        with profiler.stage("term_extraction"):
+            section_terms = self.technical_term_extractor.extract_document(contents) if contents else []
+            prepared = [self.prepare_section(content, tech_terms, sentences)
+                        for content, tech_terms, sentences in zip(contents, section_terms, key_sentences)]
+
+        self.embedding_store.clear()
+        target_words = self.target_word_count(total_words, target_length)
+        budgets = self.plan_section_budgets(importances, section_count, target_words)
+        
+        self.monitor.set_stage("generating")
+        summarized_sections = list(zip(names, self.summarize_sections(contents, budgets, prepared)))
+        
+        if not summarized_sections:
+            return "The input text does not contain any content to summarize."
+        
+        summarized_sections = self.adjust_section_lengths(summarized_sections, budgets)
+        
+        self.monitor.set_stage("formatting")
+        with profiler.stage("postprocess"):
+            summary = self.postprocessor.format_summary(summarized_sections)
+        self._cache_set(summary_key, summary)
+        return summary
+
+    def _summarize_hierarchical(self, sections, target_length, group_size=4):
+        # Map: every chunk is summarized independently in batched generate
+        # calls.  Reduce: neighbouring summaries are concatenated in groups
+        # that fit the model context and summarized again, level by level,
+        # until the target length is met.  Each level at least halves the
+        # number of summaries, so the total number of generations stays O(n).
+        profiler = self.profiler
+        total_words = 0
+        document_hash = hashlib.sha256()
+        names, contents = [], []
+        self.monitor.set_stage("reading")
+        for section_name, section_content in sections:
+            self.monitor.check()
+            total_words += len(word_tokenize(section_content))
+            document_hash.update(json.dumps([section_name, section_content]).encode("utf-8"))
+            if section_content.strip():
+                names.append(section_name)
+                contents.append(section_content)
+        profiler.count("sections", len(contents))
+        profiler.count("input_words", total_words)
+
+        summary_key = self._cache_key("summary-hierarchical", document_hash.hexdigest(), target_length)
+        cached_summary = self._cache_get(summary_key)
+        if cached_summary is not None:
+            profiler.count("summary_cache_hits")
+            return cached_summary
+        if not contents:
+            return "The input text does not contain any content to summarize."
+
+        self.embedding_store.clear()
+        target_words = self.target_word_count(total_words, target_length)
+        leaf_words = min(250, max(60, math.ceil(2 * target_words / len(contents))))
+        self.monitor.set_stage("preparing")
+        with profiler.stage("term_extraction"):
+            tech_terms = self.technical_term_extractor.extract_document(contents)
+        self.monitor.set_stage("generating")
+        summaries = self.abstractive_summarizer.summarize_batch(
+            contents,
+            max_lengths=[leaf_words] * len(contents),
+            min_lengths=[leaf_words // 2] * len(contents),
+            tech_terms=tech_terms
+        )
+
+        while len(summaries) > 1 and sum(len(summary.split()) for summary in summaries) > target_words:
+            groups = self._reduce_groups(summaries, group_size)
+            if all(len(group) == 1 for group in groups):
+                break
+            group_words = min(400, max(60, target_words // len(groups)))
+            merged = [group for group in groups if len(group) > 1]
+            merged_summaries = iter(self.abstractive_summarizer.summarize_batch(
+                [" ".join(summaries[i] for i in group) for group in merged],
+                max_lengths=[group_words] * len(merged),
+                min_lengths=[group_words // 2] * len(merged)
+            ))
+            names = [next((names[i] for i in group if names[i]), "") for group in groups]
+            summaries = [next(merged_summaries) if len(group) > 1 else summaries[group[0]] for group in groups]
+
+        self.monitor.set_stage("formatting")
+        with profiler.stage("postprocess"):
+            summary = self.postprocessor.format_summary(list(zip(names, summaries)))
+        self._cache_set(summary_key, summary)
+        return summary
+
+    def _reduce_groups(self, summaries, group_size):
+        groups = []
+        used = 0
+        for index, count in enumerate(self.chunker.count_tokens(summaries)):
+            if groups and len(groups[-1]) < group_size and used + count <= self.chunker.max_tokens:
+                groups[-1].append(index)
+                used += count
+            else:
+                groups.append([index])
+                used = count
+        return groups
+
+    def _cache_key(self, kind, *parts):
+        return SummaryCache.make_key(kind, self.bart_model, self.backend.name, self.sentence_model, *parts)
+
+    def _cache_get(self, key):
+        if self.cache is None:
+            return None
+        try:
+            return self.cache.get(key)
+        except sqlite3.Error as e:
+            logger.warning(f"Summary cache read failed: {str(e)}")
+            return None
+
+    def _cache_set(self, key, value):
+        if self.cache is None:
+            return
+        try:
+            self.cache.set(key, value)
+        except sqlite3.Error as e:
+            logger.warning(f"Summary cache write failed: {str(e)}")
     
     def calculate_importance(self, content):
         sentences = sent_tokenize(content)
@@ -276,15 +1294,61 @@ class SummarizationPipeline:
         return min(max(importance, 0.5), 2.0)
     
     def summarize_section(self, content, target_words):
-        tech_terms = self.technical_term_extractor.extract(content)
+        return self.summarize_sections([content], [target_words])[0]
+
+    def summarize_sections(self, contents, target_words, prepared=None):
+        # Sections already summarized at the same budget (a rerun, or a
+        # document sharing sections with an earlier one) come from the
+        # cache; the rest go through one batched generation.  Budgets differ
+        # between summary levels, so a run at another level only reuses the
+        # cached TextRank key sentences (see extract_key_sentences).
+        keys = [self._cache_key("section", text_digest(content), words)
+                for content, words in zip(contents, target_words)]
+        results = [self._cache_get(key) for key in keys]
+        pending = [i for i, result in enumerate(results) if result is None]
+        if not pending:
+            return results
+
+        if prepared is None:
+            prepared = {i: self.prepare_section(contents[i]) for i in pending}
+        abstract_summaries = self.abstractive_summarizer.summarize_batch(
+            [prepared[i][0] for i in pending],
+            max_lengths=[target_words[i] for i in pending],
+            min_lengths=[target_words[i] // 2 for i in pending],
+            tech_terms=[prepared[i][1] for i in pending]
+        )
+
+        # Encode the sentences of the generated sections and of their
+        # summaries in one batched pass; verification and takeaway
+        # selection then only read the store.  Cached sections skip this.
+        if self.fact_checker.sentence_model is not None:
+            with self.profiler.stage("sentence_encoding"):
+                self.embedding_store.encode([sentence for i, summary in zip(pending, abstract_summaries)
+                                             for text in (contents[i], summary) for sentence in sent_tokenize(text)])
+        for i, summary in zip(pending, abstract_summaries):
+            self.monitor.check()
+            with self.profiler.stage("fact_check"):
+                results[i] = self.fact_checker.verify(summary, contents[i], max_words=target_words[i])
+            self._cache_set(keys[i], results[i])
+        return results
+
+    def prepare_section(self, content, tech_terms=None, key_sentences=None):
+        if tech_terms is None:
+            tech_terms = self.technical_term_extractor.extract(content)
+        if key_sentences is None:
+            key_sentences = self.extract_key_sentences(content)
+        key_sentences = self.ensure_tech_terms_included(list(key_sentences), tech_terms, content)
+        return " ".join(key_sentences), tech_terms
+
+    def extract_key_sentences(self, content):
+        key = self._cache_key("key-sentences", text_digest(content))
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+
         key_sentences = self.extractive_summarizer.summarize(content, sentences_count=min(5, len(sent_tokenize(content))))
-        key_sentences = self.ensure_tech_terms_included(key_sentences, tech_terms, content)
-        
-        combined_content = " ".join(key_sentences)
-        abstract_summary = self.abstractive_summarizer.summarize(combined_content, max_length=target_words, min_length=target_words//2, tech_terms=tech_terms)
-        
-        verified_summary = self.fact_checker.verify(abstract_summary, content)
-        return verified_summary
+        self._cache_set(key, key_sentences)
+        return key_sentences
     
     def ensure_tech_terms_included(self, sentences, tech_terms, original_content):
         included_terms = set()
@@ -308,22 +1372,86 @@ class SummarizationPipeline:
                     break
         return additional_sentences
 
-    def adjust_section_lengths(self, sections, target_words):
-        current_words = sum(len(word_tokenize(content)) for _, content in sections)
-        scale_factor = target_words / current_words if current_words > target_words else 1
-        
-        adjusted_sections = []
-        for name, content in sections:
-            target_section_words = int(len(word_tokenize(content)) * scale_factor)
-            adjusted_content = self.abstractive_summarizer.summarize(
-                content, 
-                max_length=target_section_words, 
-                min_length=max(30, target_section_words // 2)
-            )
-            adjusted_sections.append((name, adjusted_content))
-        
+    @staticmethod
+    def plan_section_budgets(importances, section_count, target_words, min_words=30):
+        # Budgets are fixed before the first generation so that their sum
+        # stays within the document target; no second pass is needed for
+        # sections that respect them.  The floor gives way when there are
+        # too many sections for every one of them to get min_words.
+        words_per_section = max(50, target_words // section_count) if section_count else target_words
+        budgets = [int(words_per_section * importance) for importance in importances]
+        if sum(budgets) <= target_words:
+            return budgets
+
+        floor = min(min_words, target_words // len(budgets))
+        # Sections that would scale below the floor are pinned to it and the
+        # others share what is left, until no scaled budget is below it
+        pinned = set()
+        while True:
+            free = [i for i in range(len(budgets)) if i not in pinned]
+            if not free:
+                break
+            scale_factor = (target_words - floor * len(pinned)) / sum(budgets[i] for i in free)
+            below = [i for i in free if budgets[i] * scale_factor < floor]
+            if not below:
+                break
+            pinned.update(below)
+        return [floor if i in pinned else int(budget * scale_factor) for i, budget in enumerate(budgets)]
+
+    def adjust_section_lengths(self, sections, budgets):
+        # Generation is capped at the budget in tokens and verification at
+        # the budget in words, so this second, batched pass only runs for
+        # sections that still overflow, such as ones cached by older versions.
+        overflowing = [i for i, ((_, content), budget) in enumerate(zip(sections, budgets))
+                       if len(content.split()) > budget]
+        if not overflowing:
+            return sections
+
+        adjusted_contents = self.abstractive_summarizer.summarize_batch(
+            [sections[i][1] for i in overflowing],
+            max_lengths=[budgets[i] for i in overflowing],
+            min_lengths=[min(budgets[i], max(30, budgets[i] // 2)) for i in overflowing]
+        )
+        adjusted_sections = list(sections)
+        for i, content in zip(overflowing, adjusted_contents):
+            adjusted_sections[i] = (sections[i][0], content)
         return adjusted_sections
 
+def unigram_f1(candidate, reference):
+    # ROUGE-1 style overlap, enough to flag a backend drifting from FP32
+    candidate_tokens = word_tokenize(candidate.lower())
+    reference_tokens = word_tokenize(reference.lower())
+    if not candidate_tokens or not reference_tokens:
+        return float(candidate_tokens == reference_tokens)
+    reference_counts = {}
+    for token in reference_tokens:
+        reference_counts[token] = reference_counts.get(token, 0) + 1
+    overlap = 0
+    for token in candidate_tokens:
+        if reference_counts.get(token, 0) > 0:
+            reference_counts[token] -= 1
+            overlap += 1
+    if not overlap:
+        return 0.0
+    precision = overlap / len(candidate_tokens)
+    recall = overlap / len(reference_tokens)
+    return 2 * precision * recall / (precision + recall)
+
+
+def measure_backend_drift(texts, backend, reference_backend="torch", model_name=BART_MODEL_NAME,
+                          max_length=130, min_length=30):
+    """Summarize ``texts`` with both backends and return unigram F1 per text."""
+    candidate = ImprovedAbstractiveSummarizer(model_name, backend)
+    reference = ImprovedAbstractiveSummarizer(model_name, reference_backend)
+    try:
+        lengths = ([max_length] * len(texts), [min_length] * len(texts))
+        candidate_summaries = candidate.summarize_batch(texts, *lengths)
+        reference_summaries = reference.summarize_batch(texts, *lengths)
+    finally:
+        candidate.close()
+        reference.close()
+    return [unigram_f1(c, r) for c, r in zip(candidate_summaries, reference_summaries)]
+
 # Example usage
 if __name__ == "__main__":
     pipeline = SummarizationPipeline()
@@ -343,7 +1471,7 @@ if __name__ == "__main__":
 
 # To change the summary length:
 
-# 1. Locate the `summarize` method in the SummarizationPipeline class
+# 1. Locate the `target_word_count` method in the SummarizationPipeline class
 # 2. Find the `target_word_counts` dictionary
 # 3. Adjust the values for 'short', 'medium', and 'long' as needed
 
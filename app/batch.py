@@ -0,0 +1,287 @@
+import os
+import sys
+import glob
+import json
+import time
+import queue
+import hashlib
+import logging
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import freeze_support
+from extraction import FileChecker, FileCheckError, TextPreprocessor
+from SummaryEngine import SummarizationPipeline, SummaryCache, SUMMARIZATION_ERROR, INFERENCE_BACKENDS
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+SUPPORTED_EXTENSIONS = (".pdf", ".docx", ".doc")
+MANIFEST_NAME = "manifest.json"
+
+
+def collect_files(inputs):
+    files = set()
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, names in os.walk(item):
+                for name in names:
+                    if name.lower().endswith(SUPPORTED_EXTENSIONS):
+                        files.add(os.path.abspath(os.path.join(root, name)))
+        else:
+            for path in glob.glob(item, recursive=True):
+                if os.path.isfile(path) and path.lower().endswith(SUPPORTED_EXTENSIONS):
+                    files.add(os.path.abspath(path))
+    return sorted(files)
+
+
+def output_name(file_path):
+    # Readable parent and file name (extension included, so report.pdf and
+    # report.docx differ) plus a short hash of the absolute path, so files
+    # with the same name in same-named folders never share an output.
+    file_path = os.path.abspath(file_path)
+    parent = os.path.basename(os.path.dirname(file_path))
+    digest = hashlib.sha1(file_path.encode("utf-8")).hexdigest()[:8]
+    return f"{parent}__{os.path.basename(file_path)}_{digest}_summarised.txt"
+
+
+class Manifest:
+    """Per-file results of a batch run.
+
+    Each record is appended as one JSON line to a journal next to the
+    manifest, so recording stays cheap however many files a run has.
+    manifest.json itself is rewritten every ``write_every`` records and
+    when the run ends; a resumed run replays the journal on top of it.
+    """
+
+    write_every = 100
+
+    def __init__(self, path, resume=False):
+        self.path = path
+        self.journal_path = os.path.splitext(path)[0] + ".jsonl"
+        self._lock = threading.Lock()
+        self.entries = {}
+        self._unwritten = 0
+        if resume:
+            if os.path.exists(path):
+                with open(path, "r", encoding="utf-8") as manifest_file:
+                    self.entries = json.load(manifest_file).get("files", {})
+            self._replay_journal()
+        self._journal = open(self.journal_path, "a", encoding="utf-8")
+        # Start from a compacted manifest and an empty journal, which also
+        # drops a line torn by an interrupted run
+        self._write()
+
+    def _replay_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "r", encoding="utf-8") as journal:
+            for line in journal:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # A line torn by an interrupted run
+                self.entries[record["file"]] = record["entry"]
+
+    def is_done(self, file_path):
+        entry = self.entries.get(file_path)
+        return (
+            entry is not None
+            and entry["status"] == "ok"
+            and os.path.exists(entry["output"])
+        )
+
+    def record(self, file_path, entry):
+        with self._lock:
+            self.entries[file_path] = entry
+            self._journal.write(json.dumps({"file": file_path, "entry": entry}) + "\n")
+            self._journal.flush()
+            self._unwritten += 1
+            if self._unwritten >= self.write_every:
+                self._write()
+
+    def flush(self):
+        with self._lock:
+            self._write()
+
+    def close(self):
+        with self._lock:
+            if not self._journal.closed:
+                self._write()
+                self._journal.close()
+
+    def _write(self):
+        # Write-then-rename so an interrupted run never leaves a torn
+        # manifest.  Everything journaled so far is now in it, so the
+        # journal starts over.
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as manifest_file:
+            json.dump({"files": self.entries}, manifest_file, indent=2)
+        os.replace(tmp_path, self.path)
+        self._journal.seek(0)
+        self._journal.truncate()
+        self._unwritten = 0
+
+
+class BatchRunner:
+    def __init__(self, output_dir, summary_level="medium", workers=2,
+                 max_pages=50, resume=False, use_cache=True, backend="torch", mode="sections",
+                 trace_dir=None, ocr=False, processes=1):
+        self.output_dir = output_dir
+        self.ocr = ocr
+        self.processes = processes
+        self.trace_dir = trace_dir
+        self.summary_level = summary_level
+        self.mode = mode
+        self.workers = workers
+        self.max_pages = max_pages
+        os.makedirs(output_dir, exist_ok=True)
+        if trace_dir:
+            os.makedirs(trace_dir, exist_ok=True)
+        self.manifest = Manifest(os.path.join(output_dir, MANIFEST_NAME), resume)
+        cache = SummaryCache() if use_cache else None
+
+        # One pipeline per worker; the models behind them are loaded once
+        # and shared through the model registry.
+        self.pipelines = queue.Queue()
+        for _ in range(workers):
+            self.pipelines.put(SummarizationPipeline(cache=cache, backend=backend))
+        self.preprocessor = TextPreprocessor.sentence_preserving()
+
+    def run(self, files):
+        pending = [path for path in files if not self.manifest.is_done(path)]
+        logging.info(
+            f"{len(files)} files found, {len(files) - len(pending)} already done, "
+            f"{len(pending)} to summarize with {self.workers} workers."
+        )
+        scheduled = self.schedule(pending)
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(self.process_file, scheduled))
+        self.manifest.flush()
+        return len(pending) - len(scheduled) + sum(1 for ok in results if not ok)
+
+    def schedule(self, files):
+        # The preflight only reads metadata, so every file is screened up
+        # front.  Rejected files are recorded straight away; the rest run
+        # largest first so no worker is left with a big file at the end.
+        costs = {}
+        for file_path in files:
+            preflight = FileChecker(file_path, self.max_pages).preflight()
+            if preflight.accepted:
+                costs[file_path] = preflight.estimated_cost
+            else:
+                self.manifest.record(file_path, {
+                    "status": "failed", "output": None, "pages": preflight.pages or 0,
+                    "error": preflight.message,
+                })
+                logging.info(f"REJECTED: {file_path} ({preflight.message})")
+        logging.info(f"Estimated work: {sum(costs.values())} pages in {len(costs)} files.")
+        return sorted(costs, key=costs.get, reverse=True)
+
+    def close(self):
+        self.manifest.close()
+        while not self.pipelines.empty():
+            self.pipelines.get().close()
+
+    def process_file(self, file_path):
+        entry = {"status": "failed", "output": None, "pages": 0}
+        start_time = time.perf_counter()
+        file_checker = FileChecker(file_path, self.max_pages, n_processes=self.processes, ocr=self.ocr)
+        try:
+            # Pages are validated, preprocessed and sectioned as they are
+            # decoded, so summarization starts before the file is fully read.
+            pages = file_checker.iter_pages()
+            pipeline = self.pipelines.get()
+            try:
+                summary = pipeline.summarize_pages(pages, self.summary_level, self.mode,
+                                                   preprocess=self.preprocessor.preprocess)
+                report = pipeline.last_report
+            finally:
+                self.pipelines.put(pipeline)
+                pages.close()  # Closes the document if summarization stopped early
+            stages = report.stages
+            entry["extract_seconds"] = round(stages.get("extraction", {}).get("seconds", 0.0), 3)
+            entry["preprocess_seconds"] = round(stages.get("preprocess", {}).get("seconds", 0.0), 3)
+            entry["summarize_seconds"] = round(report.total_seconds, 3)
+            entry["profile"] = report.as_dict()
+            if self.trace_dir:
+                trace_name = os.path.splitext(output_name(file_path))[0] + ".trace.json"
+                report.write_chrome_trace(os.path.join(self.trace_dir, trace_name))
+            if summary == SUMMARIZATION_ERROR:
+                entry["error"] = summary
+                return False
+
+            output_path = os.path.join(self.output_dir, output_name(file_path))
+            with open(output_path, "w", encoding="utf-8") as output_file:
+                output_file.write(summary)
+            entry.update(status="ok", output=output_path)
+            return True
+        except FileCheckError as e:
+            entry["error"] = str(e)
+            return False
+        except Exception as e:
+            logging.error(f"Failed to summarize {file_path}: {e}")
+            entry["error"] = str(e)
+            return False
+        finally:
+            entry["pages"] = file_checker.total_pages
+            entry["total_seconds"] = round(time.perf_counter() - start_time, 3)
+            self.manifest.record(file_path, entry)
+            logging.info(f"{entry['status'].upper()}: {file_path} ({entry['total_seconds']}s)")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Summarize a folder or glob of PDF/Word files without the GUI."
+    )
+    parser.add_argument("inputs", nargs="+", help="Directories or glob patterns of .pdf/.docx/.doc files")
+    parser.add_argument("-o", "--output-dir", required=True, help="Where summaries and manifest.json are written")
+    parser.add_argument("-l", "--level", choices=["short", "medium", "long"], default="medium")
+    parser.add_argument("-w", "--workers", type=int, default=2, help="Documents summarized concurrently")
+    parser.add_argument("--max-pages", type=int, default=50, help="Page limit per file, 0 for no limit")
+    parser.add_argument("--mode", choices=["sections", "hierarchical"], default="sections",
+                        help="hierarchical merges chunk summaries recursively, for very long files")
+    parser.add_argument("--resume", action="store_true", help="Skip files already summarized in manifest.json")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the on-disk summary cache")
+    parser.add_argument("--backend", choices=sorted(INFERENCE_BACKENDS), default="torch",
+                        help="Abstractive inference backend (int8 and onnx are faster on CPU)")
+    parser.add_argument("-p", "--processes", type=int, default=1,
+                        help="Processes decoding each PDF; only used for files of 200+ pages")
+    parser.add_argument("--ocr", action="store_true",
+                        help="OCR PDF pages without a text layer (needs pytesseract and Tesseract)")
+    parser.add_argument("--trace-dir", help="Write a Chrome trace (chrome://tracing) per file to this folder")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    files = collect_files(args.inputs)
+    if not files:
+        logging.error("No .pdf, .docx or .doc files matched the given inputs.")
+        return 2
+
+    runner = BatchRunner(
+        args.output_dir,
+        summary_level=args.level,
+        workers=args.workers,
+        max_pages=args.max_pages or None,
+        resume=args.resume,
+        use_cache=not args.no_cache,
+        backend=args.backend,
+        mode=args.mode,
+        trace_dir=args.trace_dir,
+        ocr=args.ocr,
+        processes=args.processes,
+    )
+    try:
+        failures = runner.run(files)
+    finally:
+        runner.close()
+    logging.info(f"Done with {failures} failures. Manifest: {runner.manifest.path}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    freeze_support()
+    sys.exit(main())
@@ -1,126 +1,650 @@
 import os
+import re
+import atexit
 import logging
+import weakref
 import fitz  # PyMuPDF
 from io import StringIO
-from docx import Document
-from langdetect import detect, LangDetectException
+from collections import OrderedDict, deque, namedtuple
+from langdetect import detect_langs, DetectorFactory, LangDetectException
+import math
 import multiprocessing
-import torch
+import threading
+import zipfile
+import hashlib
+import functools
+from xml.etree import ElementTree
+from array import array
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
 )
 
+# langdetect is randomised; a fixed seed makes verdicts reproducible
+DetectorFactory.seed = 0
+
+
+class FileCheckError(Exception):
+    pass
+
+
+def decode_pdf_pages(file_path, start, stop):
+    # Runs in a worker process: each worker opens the document itself, since
+    # PyMuPDF documents cannot be shared across processes.
+    doc = fitz.open(file_path)
+    try:
+        return [doc.load_page(n).get_text("text") for n in range(start, stop)]
+    finally:
+        doc.close()
+
+
+OCR_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".cache", "bel-pdf-summariser", "ocr")
+
+
+@functools.lru_cache(maxsize=None)
+def ocr_available():
+    # pytesseract and Pillow are optional, and pytesseract is only a wrapper:
+    # the Tesseract binary has to be installed as well.
+    try:
+        import pytesseract
+        import PIL  # noqa: F401
+    except ImportError:
+        return False
+    try:
+        pytesseract.get_tesseract_version()
+    except (pytesseract.TesseractNotFoundError, OSError):
+        return False
+    return True
+
+
+def ocr_pdf_page(file_path, page_index, dpi=300, language="eng", cache_dir=None):
+    # Runs in a worker process.  The page is rendered in grayscale and the
+    # OCR text is cached under a hash of the rendered image, so re-runs and
+    # the same scan in another file skip Tesseract entirely.
+    import pytesseract
+    from PIL import Image
+
+    with fitz.open(file_path) as doc:
+        pixmap = doc.load_page(page_index).get_pixmap(dpi=dpi, colorspace=fitz.csGRAY, alpha=False)
+    digest = hashlib.sha256(f"{pixmap.width}x{pixmap.height}:{language}:".encode())
+    digest.update(pixmap.samples)
+    cache_dir = cache_dir or OCR_CACHE_DIR
+    cache_path = os.path.join(cache_dir, digest.hexdigest() + ".txt")
+    try:
+        with open(cache_path, "r", encoding="utf-8") as cache_file:
+            return cache_file.read()
+    except OSError:
+        pass
+
+    image = Image.frombytes("L", (pixmap.width, pixmap.height), pixmap.samples, "raw", "L", pixmap.stride)
+    text = pytesseract.image_to_string(image, lang=language)
+
+    # Write-then-rename so concurrent workers never read a torn entry
+    os.makedirs(cache_dir, exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as cache_file:
+        cache_file.write(text)
+    os.replace(tmp_path, cache_path)
+    return text
+
+
+W_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+MC_FALLBACK = "{http://schemas.openxmlformats.org/markup-compatibility/2006}Fallback"
+DOCX_TEXT_CHARACTERS = {
+    W_NAMESPACE + "tab": "\t",
+    W_NAMESPACE + "ptab": "\t",
+    W_NAMESPACE + "cr": "\n",
+    W_NAMESPACE + "noBreakHyphen": "-",
+}
+# Elements that put something on a page even without text
+DOCX_CONTENT_TAGS = {W_NAMESPACE + "drawing", W_NAMESPACE + "pict", W_NAMESPACE + "object"}
+
+
+def docx_document_part(archive):
+    # The main part is normally word/document.xml, but the package
+    # relationships are authoritative.
+    try:
+        relationships = ElementTree.fromstring(archive.read("_rels/.rels"))
+    except (KeyError, ElementTree.ParseError):
+        return "word/document.xml"
+    for relationship in relationships:
+        if relationship.get("Type", "").endswith("/officeDocument"):
+            return relationship.get("Target").lstrip("/")
+    return "word/document.xml"
+
+
+def docx_metadata_pages(archive):
+    # Page count Word stored in docProps/app.xml on the last save, if any
+    try:
+        properties = ElementTree.fromstring(archive.read("docProps/app.xml"))
+    except (KeyError, ElementTree.ParseError):
+        return None
+    for element in properties:
+        if element.tag.endswith("}Pages") and (element.text or "").strip().isdigit():
+            return int(element.text)
+    return None
+
+
+def read_docx_pages(archive):
+    # Yields (page_number, paragraph_lines) while streaming the main
+    # document XML; finished body elements are dropped, so memory is
+    # bounded by the largest paragraph or table.  Pages end at explicit
+    # page breaks, at page breaks Word rendered on its last save
+    # (lastRenderedPageBreak) and at non-continuous section breaks.
+    # Breaks with nothing on the page since the previous one count once.
+    page_number = 1
+    lines = []
+    parts = []
+    has_content = False
+    section_break = False
+    depth = 0
+    fallback_depth = 0
+    body = None
+
+    with archive.open(docx_document_part(archive)) as document_xml:
+        for event, element in ElementTree.iterparse(document_xml, events=("start", "end")):
+            tag = element.tag
+            if event == "start":
+                depth += 1
+                if tag == MC_FALLBACK:
+                    fallback_depth += 1  # Duplicate of the preferred mc:Choice content
+                elif tag == W_NAMESPACE + "body":
+                    body = element
+                continue
+
+            depth -= 1
+            page_break = False
+            if tag == MC_FALLBACK:
+                fallback_depth -= 1
+            elif fallback_depth:
+                pass
+            elif tag == W_NAMESPACE + "t":
+                parts.append(element.text or "")
+                has_content = has_content or bool((element.text or "").strip())
+            elif tag == W_NAMESPACE + "br":
+                if element.get(W_NAMESPACE + "type") == "page":
+                    page_break = True
+                else:
+                    parts.append("\n")
+            elif tag == W_NAMESPACE + "lastRenderedPageBreak":
+                page_break = True
+            elif tag in DOCX_TEXT_CHARACTERS:
+                parts.append(DOCX_TEXT_CHARACTERS[tag])
+            elif tag in DOCX_CONTENT_TAGS:
+                has_content = True
+            elif tag == W_NAMESPACE + "sectPr" and depth > 2:
+                # Paragraph-level section properties end a section after
+                # this paragraph; the body-level ones describe the last.
+                section_type = element.find(W_NAMESPACE + "type")
+                section_break = section_type is None or section_type.get(W_NAMESPACE + "val") != "continuous"
+            elif tag == W_NAMESPACE + "p":
+                lines.append("".join(parts))
+                parts = []
+                page_break, section_break = section_break, False
+
+            if page_break and has_content:
+                if parts:
+                    lines.append("".join(parts))
+                    parts = []
+                yield page_number, lines
+                page_number += 1
+                lines = []
+                has_content = False
+
+            if depth == 2 and body is not None:
+                body.clear()
+
+    if parts:
+        lines.append("".join(parts))
+    if has_content:
+        yield page_number, lines
+
+
+# estimated_cost is in page equivalents: the real page count when the
+# metadata has one, otherwise a guess from the file size.
+PreflightResult = namedtuple(
+    "PreflightResult", ["accepted", "message", "pages", "file_size", "estimated_cost"]
+)
+TYPICAL_PAGE_BYTES = {".pdf": 100 * 1024, ".docx": 8 * 1024, ".doc": 40 * 1024}
+
+
+class LanguageVerifier:
+    """Decides a document's language from a bounded sample of its pages.
+
+    Pages are fed in order through ``check_page``.  Only a spread of pages
+    is sampled (evenly across the document when the page count is known,
+    at pages 1, 2, 4, 8, ... otherwise), each sample is capped at
+    ``sample_chars`` characters, and sampling stops as soon as
+    ``min_samples`` pages agree with at least ``confidence``.  Verdicts are
+    cached per document and verifier settings, for the most recent
+    ``max_cached_verdicts`` documents, so re-checking the same file is free.
+    """
+
+    _verdicts = OrderedDict()
+    _verdicts_lock = threading.Lock()
+    max_cached_verdicts = 1024
+
+    def __init__(self, language="en", sample_chars=1000, max_samples=6,
+                 min_samples=2, confidence=0.9, min_page_chars=200):
+        self.language = language
+        self.sample_chars = sample_chars
+        self.max_samples = max_samples
+        self.min_samples = min_samples
+        self.confidence = confidence
+        self.min_page_chars = min_page_chars
+        self.reset()
+
+    @staticmethod
+    def document_key(file_path):
+        stat = os.stat(file_path)
+        return os.path.abspath(file_path), stat.st_size, stat.st_mtime_ns
+
+    @classmethod
+    def clear_cache(cls):
+        with cls._verdicts_lock:
+            cls._verdicts.clear()
+
+    def reset(self, document_key=None, total_pages=None):
+        self.document_key = document_key
+        self.samples = []
+        self.failed_page = None
+        self.decided = False
+        self._targets = self._plan(total_pages)
+        self._leftover = ""
+        self._leftover_page = None
+
+        cache_key = self._cache_key()
+        with self._verdicts_lock:
+            if cache_key in self._verdicts:
+                self._verdicts.move_to_end(cache_key)
+                self.failed_page = self._verdicts[cache_key]
+                self.decided = True
+
+    def _cache_key(self):
+        # A verdict only holds for the settings that produced it
+        if self.document_key is None:
+            return None
+        settings = (self.language, self.sample_chars, self.max_samples,
+                    self.min_samples, self.confidence, self.min_page_chars)
+        return settings, self.document_key
+
+    def _plan(self, total_pages):
+        if total_pages:
+            count = min(self.max_samples, total_pages)
+            return sorted({1 + (i * total_pages) // count for i in range(count)})
+        return [2 ** i for i in range(self.max_samples)]
+
+    def check_page(self, page_number, text):
+        # Returns False if this page decided the document is not in the
+        # expected language.
+        if self.decided:
+            return self.failed_page != page_number
+        if not self._targets or page_number < self._targets[0]:
+            self._remember(page_number, text)
+            return True
+
+        sample = self._sample(text)
+        if len(sample) < self.min_page_chars:
+            # Too little text to judge; try again on the next page
+            self._remember(page_number, text)
+            return True
+        while self._targets and self._targets[0] <= page_number:
+            self._targets.pop(0)
+
+        language, probability = self._detect(sample)
+        self.samples.append((page_number, probability))
+        if language != self.language:
+            self._decide(page_number)
+            return False
+        if (len(self.samples) >= self.min_samples
+                and min(p for _, p in self.samples) >= self.confidence):
+            self._decide(None)
+        return True
+
+    def finish(self):
+        # Called after the last page. Returns the final verdict.
+        if not self.decided:
+            failed_page = None
+            if not self.samples:
+                language, _ = self._detect(self._leftover)
+                if language != self.language:
+                    failed_page = self._leftover_page or 1
+            self._decide(failed_page)
+        return self.failed_page is None
+
+    def _decide(self, failed_page):
+        self.failed_page = failed_page
+        self.decided = True
+        cache_key = self._cache_key()
+        if cache_key is not None:
+            with self._verdicts_lock:
+                self._verdicts[cache_key] = failed_page
+                self._verdicts.move_to_end(cache_key)
+                while len(self._verdicts) > self.max_cached_verdicts:
+                    self._verdicts.popitem(last=False)
+
+    def _sample(self, text):
+        text = text.strip()
+        if len(text) <= self.sample_chars:
+            return text
+        start = (len(text) - self.sample_chars) // 2
+        return text[start:start + self.sample_chars]
+
+    def _remember(self, page_number, text):
+        # Keep a bounded amount of text from skipped pages for documents
+        # whose pages are all too short to sample on their own.
+        if len(self._leftover) < self.sample_chars and text.strip():
+            if self._leftover_page is None:
+                self._leftover_page = page_number
+            self._leftover += " " + text.strip()[: self.sample_chars - len(self._leftover)]
+
+    def _detect(self, text):
+        try:
+            best = detect_langs(text)[0]
+            return best.lang, best.prob
+        except (LangDetectException, IndexError):
+            return None, 0.0
+
 
 class FileChecker:
-    def __init__(self, file_path, max_pages=50):
+    # max_pages=None lifts the page limit, e.g. for hierarchical summarization.
+    # Below this many pages a process pool costs more than it saves:
+    # decoding takes a few milliseconds a page, while starting the workers
+    # takes a few hundred (forked) to over a second (spawned, as on Windows).
+    parallel_min_pages = 200
+
+    def __init__(self, file_path, max_pages=50, language_verifier=None, n_processes=1,
+                 ocr=False, ocr_language="eng", ocr_processes=None, ocr_cache_dir=None):
         self.file_path = file_path
         self.max_pages = max_pages
+        self.n_processes = n_processes
+        # OCR only runs for PDF pages without a text layer
+        self.ocr = ocr
+        self.ocr_language = ocr_language
+        self.ocr_processes = ocr_processes or min(4, os.cpu_count() or 1)
+        self.ocr_cache_dir = ocr_cache_dir
+        self.language_verifier = language_verifier or LanguageVerifier()
         self.extracted_text = StringIO()
         self.total_pages = 0
+        # Page count known before reading (PDF page tree, DOCX metadata),
+        # None until iter_pages ran the preflight or when there is none
+        self.expected_pages = None
+
+    def preflight(self):
+        # Reads only metadata (file size, the PDF page tree, the DOCX
+        # docProps/app.xml page count) so oversized or unreadable files are
+        # rejected before any text is decoded.
+        ext = os.path.splitext(self.file_path)[1].lower()
+        if ext not in TYPICAL_PAGE_BYTES:
+            return PreflightResult(
+                False, "Unsupported file type. Please provide a .pdf, .docx, or .doc file.", None, 0, 0
+            )
+        try:
+            file_size = os.path.getsize(self.file_path)
+        except OSError as e:
+            return PreflightResult(False, f"Cannot read file: {e.strerror}", None, 0, 0)
 
-    def is_english(self, text):
+        kind = ext[1:].upper()
+        pages = None
         try:
-            return detect(text) == "en"
-        except LangDetectException:
-            return False
+            if ext == ".pdf":
+                with fitz.open(self.file_path) as doc:
+                    if doc.needs_pass:
+                        return PreflightResult(False, "PDF is password protected.", None, file_size, 0)
+                    pages = len(doc)
+            elif ext == ".docx":
+                with zipfile.ZipFile(self.file_path) as archive:
+                    pages = docx_metadata_pages(archive)
+        except zipfile.BadZipFile:
+            return PreflightResult(False, "DOCX file is damaged or not a Word document.", None, file_size, 0)
+        except Exception as e:
+            logging.error(f"Error reading {kind} metadata: {str(e)}")
+            return PreflightResult(False, f"Error processing {kind}: {str(e)}", None, file_size, 0)
+
+        estimated_cost = pages if pages else max(1, round(file_size / TYPICAL_PAGE_BYTES[ext]))
+        if self.max_pages is not None and pages is not None and pages > self.max_pages:
+            return PreflightResult(False, f"{kind} exceeds {self.max_pages} pages.", pages, file_size, estimated_cost)
+        return PreflightResult(True, f"{kind} passed preflight.", pages, file_size, estimated_cost)
+
+    def iter_pages(self):
+        # Yields (page_number, cleaned_text) as pages are decoded. Validation
+        # failures are raised as FileCheckError at the offending page, or
+        # right away when the preflight rejects the file.
+        preflight = self.preflight()
+        if not preflight.accepted:
+            raise FileCheckError(preflight.message)
+        self.expected_pages = preflight.pages
+        ext = os.path.splitext(self.file_path)[1].lower()
+        if ext == ".pdf":
+            return self.iter_pdf_pages()
+        elif ext == ".docx":
+            return self.iter_docx_pages()
+        elif ext == ".doc":
+            return self.iter_doc_pages()
+        raise FileCheckError(
+            "Unsupported file type. Please provide a .pdf, .docx, or .doc file."
+        )
 
-    def check_pdf(self):
+    def iter_pdf_pages(self):
+        doc = fitz.open(self.file_path)
         try:
-            doc = fitz.open(self.file_path)
             self.total_pages = len(doc)
-            if self.total_pages > self.max_pages:
-                return False, f"PDF exceeds {self.max_pages} pages."
+            if self.max_pages is not None and self.total_pages > self.max_pages:
+                raise FileCheckError(f"PDF exceeds {self.max_pages} pages.")
 
-            for page_number in range(self.total_pages):
-                page = doc.load_page(page_number)
-                text = page.get_text("text")
+            self.language_verifier.reset(
+                LanguageVerifier.document_key(self.file_path), self.total_pages
+            )
+
+            pages = enumerate(self._decode_pdf(doc), 1)
+            for page_number, text in self._ocr_missing_text(pages):
                 if not text:
-                    return (
-                        False,
-                        f"PDF page {page_number + 1} might be a scanned image.",
+                    raise FileCheckError(
+                        f"PDF page {page_number} might be a scanned image."
                     )
 
-                if not self.is_english(text):
-                    return (
-                        False,
-                        f"Non-English content detected on page {page_number + 1}.",
-                    )
+                self._check_language(page_number, text)
 
                 cleaned_text = "\n".join(
                     line.strip() for line in text.split("\n") if line.strip()
                 )
-                self.extracted_text.write(
-                    f"--- Page {page_number + 1} ---\n{cleaned_text}\n\n"
+                yield page_number, cleaned_text
+
+            self._finish_language_check()
+        finally:
+            doc.close()
+
+    def _decode_pdf(self, doc):
+        if self.n_processes <= 1 or self.total_pages < self.parallel_min_pages:
+            for page_number in range(self.total_pages):
+                yield doc.load_page(page_number).get_text("text")
+            return
+
+        # Split the page range into a few chunks per worker so the first
+        # pages arrive early, then yield in page order.  Validation runs on
+        # the ordered stream, so the first bad page is still reported.
+        chunk_size = math.ceil(self.total_pages / (self.n_processes * 4))
+        executor = ProcessPoolExecutor(max_workers=self.n_processes)
+        try:
+            futures = [
+                executor.submit(
+                    decode_pdf_pages,
+                    self.file_path,
+                    start,
+                    min(start + chunk_size, self.total_pages),
                 )
+                for start in range(0, self.total_pages, chunk_size)
+            ]
+            for future in futures:
+                yield from future.result()
+        finally:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def _ocr_missing_text(self, pages):
+        if not self.ocr:
+            yield from pages
+            return
+        if not ocr_available():
+            logging.warning("OCR requested but pytesseract or Tesseract is not installed; skipping OCR.")
+            yield from pages
+            return
+
+        # Pages without text are handed to the OCR pool while later pages
+        # keep decoding.  Up to a few pages per worker are held back, so a
+        # run of scanned pages is recognised concurrently but still comes
+        # out in page order.
+        window = self.ocr_processes * 2
+        executor = None
+        pending = deque()
+        try:
+            for page_number, text in pages:
+                if not text.strip():
+                    if executor is None:
+                        executor = ProcessPoolExecutor(max_workers=self.ocr_processes)
+                    text = executor.submit(
+                        ocr_pdf_page, self.file_path, page_number - 1,
+                        language=self.ocr_language, cache_dir=self.ocr_cache_dir,
+                    )
+                pending.append((page_number, text))
+                while pending and (len(pending) > window or isinstance(pending[0][1], str)
+                                   or pending[0][1].done()):
+                    yield self._resolve_ocr(*pending.popleft())
+            while pending:
+                yield self._resolve_ocr(*pending.popleft())
+        finally:
+            if executor is not None:
+                executor.shutdown(wait=False, cancel_futures=True)
+
+    @staticmethod
+    def _resolve_ocr(page_number, text):
+        if isinstance(text, str):
+            return page_number, text
+        return page_number, text.result().strip()
+
+    def iter_docx_pages(self):
+        # Streams word/document.xml straight from the package and stops at
+        # the first page past max_pages.
+        with zipfile.ZipFile(self.file_path) as archive:
+            metadata_pages = docx_metadata_pages(archive)
+            self.language_verifier.reset(
+                LanguageVerifier.document_key(self.file_path), metadata_pages
+            )
+            self.total_pages = 0
+            for page_number, lines in read_docx_pages(archive):
+                if self.max_pages is not None and page_number > self.max_pages:
+                    raise FileCheckError(f"DOCX exceeds {self.max_pages} pages.")
+                self.total_pages = page_number
+                yield self._word_page(page_number, lines)
+
+        # Word's own count also covers pages it did not mark with a
+        # rendered break (inside tables, text boxes, ...)
+        self.total_pages = max(self.total_pages, metadata_pages or 0)
+        self._finish_language_check()
+
+    def iter_doc_pages(self):
+        import win32com.client as win32
+
+        word = win32.Dispatch("Word.Application")
+        doc = word.Documents.Open(self.file_path)
+        try:
+            paragraphs = (
+                doc.Paragraphs[i + 1].Range.Text.strip()
+                for i in range(doc.Paragraphs.Count)
+            )
+            yield from self._iter_word_pages(paragraphs, "DOC")
+        finally:
+            doc.Close(False)
+            word.Quit()
+
+    def _iter_word_pages(self, paragraphs, kind):
+        # Word files carry no reliable page boundaries, so pages are split on
+        # "PAGE BREAK" markers.
+        self.language_verifier.reset(LanguageVerifier.document_key(self.file_path))
+        page_count = 0
+        page_lines = []
+
+        for para in paragraphs:
+            if "PAGE BREAK" in para:
+                if page_lines:
+                    yield self._word_page(page_count + 1, page_lines)
+                    page_lines = []
+                page_count += 1
+            if self.max_pages is not None and page_count >= self.max_pages:
+                raise FileCheckError(f"{kind} exceeds {self.max_pages} pages.")
+
+            page_lines.append(para)
+
+        if page_lines:
+            yield self._word_page(page_count + 1, page_lines)
+        self.total_pages = page_count // 2  # Rough estimate for Word files
+        self._finish_language_check()
+
+    def _word_page(self, page_number, lines):
+        text = "\n".join(lines) + "\n"
+        self._check_language(page_number, text)
+        return page_number, text
+
+    def _check_language(self, page_number, text):
+        if not self.language_verifier.check_page(page_number, text):
+            raise FileCheckError(f"Non-English content detected on page {page_number}.")
+
+    def _finish_language_check(self):
+        if not self.language_verifier.finish():
+            raise FileCheckError(
+                f"Non-English content detected on page {self.language_verifier.failed_page}."
+            )
+
+    def format_page(self, page_number, text):
+        # The layout check_file writes pages into extracted_text
+        if os.path.splitext(self.file_path)[1].lower() == ".pdf":
+            return f"--- Page {page_number} ---\n{text}\n\n"
+        return text
 
+    def check_pdf(self):
+        try:
+            for page_number, cleaned_text in self.iter_pdf_pages():
+                self.extracted_text.write(self.format_page(page_number, cleaned_text))
             return True, "PDF is valid."
+        except FileCheckError as e:
+            return False, str(e)
         except Exception as e:
             logging.error(f"Error processing PDF: {str(e)}")
             return False, f"Error processing PDF: {str(e)}"
 
     def check_docx(self):
         try:
-            doc = Document(self.file_path)
-            page_count = 0
-            text_buffer = StringIO()
-
-            for para in doc.paragraphs:
-                if "PAGE BREAK" in para.text:
-                    page_count += 1
-                if page_count >= self.max_pages:
-                    return False, f"DOCX exceeds {self.max_pages} pages."
-
-                text_buffer.write(para.text + "\n")
-
-            text = text_buffer.getvalue()
-            self.total_pages = page_count // 2  # Rough estimate for DOCX
-
-            if not self.is_english(text):
-                return False, "The document is not in English."
-
-            self.extracted_text.write(text)
+            self._write_word_pages(self.iter_docx_pages())
             return True, "DOCX is valid."
+        except FileCheckError as e:
+            return False, str(e)
         except Exception as e:
             logging.error(f"Error processing DOCX: {str(e)}")
             return False, f"Error processing DOCX: {str(e)}"
 
     def check_doc(self):
         try:
-            import win32com.client as win32
-
-            word = win32.Dispatch("Word.Application")
-            doc = word.Documents.Open(self.file_path)
-            text_buffer = StringIO()
-            page_count = 0
-
-            for i in range(doc.Paragraphs.Count):
-                para = doc.Paragraphs[i + 1].Range.Text.strip()
-                if "PAGE BREAK" in para:
-                    page_count += 1
-                if page_count >= self.max_pages:
-                    doc.Close(False)
-                    word.Quit()
-                    return False, f"DOC exceeds {self.max_pages} pages."
-
-                text_buffer.write(para + "\n")
-
-            text = text_buffer.getvalue()
-            self.total_pages = page_count // 2  # Rough estimate for DOC
-
-            doc.Close(False)
-            word.Quit()
-
-            if not self.is_english(text):
-                return False, "The document is not in English."
-
-            self.extracted_text.write(text)
+            self._write_word_pages(self.iter_doc_pages())
             return True, "DOC is valid."
+        except FileCheckError as e:
+            return False, str(e)
         except Exception as e:
             logging.error(f"Error processing DOC: {str(e)}")
             return False, f"Error processing DOC: {str(e)}"
 
+    def _write_word_pages(self, pages):
+        # Nothing is written until the whole file validated, so a failed
+        # check leaves extracted_text empty.
+        text_buffer = StringIO()
+        for page_number, text in pages:
+            text_buffer.write(self.format_page(page_number, text))
+        self.extracted_text.write(text_buffer.getvalue())
+
     def check_file(self):
+        preflight = self.preflight()
+        if not preflight.accepted:
+            return False, preflight.message
         ext = os.path.splitext(self.file_path)[1].lower()
         if ext == ".pdf":
             return self.check_pdf()
@@ -154,32 +678,201 @@ class TextExtractor:
         self.text.truncate(0)  # Clear the text buffer
         self.text.seek(0)
 
+# Preprocessor rebuilt once in each pool worker by its initializer, so
+# tasks only carry text and the pool itself is never pickled.
+_worker_preprocessor = None
+
+
+def _init_preprocess_worker(rules):
+    global _worker_preprocessor
+    _worker_preprocessor = TextPreprocessor(**rules)
+
+
+def _attach_shared_memory(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before Python 3.13 attaching also registers the block with the
+        # resource tracker.  Pool workers share the parent's tracker, so the
+        # duplicate entry goes away when the parent unlinks the block.
+        return shared_memory.SharedMemory(name=name)
+
+
+def _preprocess_shared_range(task):
+    # Reads one byte range of the shared document and writes the result
+    # back over it when it fits (punctuation removal usually shrinks the
+    # text).  Returns the result length, or -1 and the bytes otherwise.
+    name, start, length = task
+    block = _attach_shared_memory(name)
+    try:
+        text = bytes(block.buf[start:start + length]).decode("utf-8", "surrogatepass")
+        encoded = _worker_preprocessor.preprocess(text).encode("utf-8", "surrogatepass")
+        if len(encoded) <= length:
+            block.buf[start:start + len(encoded)] = encoded
+            return len(encoded), None
+        return -1, encoded
+    finally:
+        block.close()
+
+
+_live_preprocessors = weakref.WeakSet()
+
+
+def shutdown_preprocessor_pools():
+    for preprocessor in list(_live_preprocessors):
+        preprocessor.shutdown()
+
+
+atexit.register(shutdown_preprocessor_pools)
+
+
 class TextPreprocessor:
-    def __init__(self):
-        pass
+    # Punctuation is removed with a byte translation table over the UTF-8
+    # text (multi-byte sequences never contain ASCII bytes), then a regex
+    # pass drops the non-ASCII punctuation that remains.  Together they
+    # remove exactly the characters failing str.isalnum()/str.isspace().
+    SENTENCE_TERMINATORS = ".!?"
+    NON_ASCII_PUNCTUATION = re.compile(r"[^\w\s\x00-\x7f]")
+    CASE_RULES = ("lower", "casefold", "preserve")
+    PUNCTUATION_RULES = ("strip", "keep")
+    # Below this many characters process_in_parallel stays in-process:
+    # starting workers and shipping text costs more than it saves.
+    parallel_min_chars = 500_000
+    # Tasks cover at least this many bytes of the document
+    min_task_bytes = 64 * 1024
+
+    def __init__(self, case="lower", punctuation="strip", keep_sentence_terminators=False):
+        if case not in self.CASE_RULES:
+            raise ValueError(f"case must be one of {', '.join(self.CASE_RULES)}.")
+        if punctuation not in self.PUNCTUATION_RULES:
+            raise ValueError(f"punctuation must be one of {', '.join(self.PUNCTUATION_RULES)}.")
+        self.case = case
+        self.punctuation = punctuation
+        self.keep_sentence_terminators = keep_sentence_terminators
+        if punctuation == "keep":
+            self._deletions = None
+        else:
+            keep = self.SENTENCE_TERMINATORS if keep_sentence_terminators else ""
+            self._deletions = bytes(
+                code for code in range(128)
+                if not (chr(code).isalnum() or chr(code).isspace() or chr(code) in keep)
+            )
+        self._pool = None
+        self._pool_size = 0
+        self._pool_lock = threading.Lock()
+
+    def rules(self):
+        return {
+            "case": self.case,
+            "punctuation": self.punctuation,
+            "keep_sentence_terminators": self.keep_sentence_terminators,
+        }
+
+    @classmethod
+    def sentence_preserving(cls):
+        # For text going to the summarizer: sentence terminators keep
+        # sent_tokenize working and capitalised headings still split sections.
+        return cls(case="preserve", keep_sentence_terminators=True)
 
     def preprocess(self, text):
-        preprocessed_text = text.lower()
-        preprocessed_text = "".join(
-            [char for char in preprocessed_text if char.isalnum() or char.isspace()]
-        )
-        return preprocessed_text
+        if self.case == "lower":
+            text = text.lower()
+        elif self.case == "casefold":
+            text = text.casefold()
+        if self._deletions is not None:
+            encoded = text.encode("utf-8", "surrogatepass").translate(None, self._deletions)
+            text = encoded.decode("utf-8", "surrogatepass")
+            if not text.isascii():
+                text = self.NON_ASCII_PUNCTUATION.sub("", text)
+        return text
 
     def process_in_parallel(self, text, n_processes):
-        # Split text into chunks and process in parallel
-        chunks = text.split(
-            "\n\n"
-        )  # Assuming paragraphs are separated by double newlines
-        pool = multiprocessing.Pool(processes=n_processes)
-        preprocessed_chunks = pool.map(self.preprocess, chunks)
-        pool.close()
-        pool.join()
-        return "\n\n".join(preprocessed_chunks)
+        # Every rule works character by character, so the document can be
+        # cut at paragraph breaks and the pieces processed independently.
+        if n_processes <= 1 or len(text) < self.parallel_min_chars:
+            return self.preprocess(text)
+
+        # The document is encoded once into shared memory.  Tasks carry only
+        # byte ranges and results are written back in place, so no text is
+        # pickled in either direction.
+        encoded = text.encode("utf-8", "surrogatepass")
+        ranges = self._split_ranges(encoded, n_processes)
+        block = shared_memory.SharedMemory(create=True, size=len(encoded))
+        try:
+            block.buf[:len(encoded)] = encoded
+            del encoded
+            tasks = [(block.name, start, length) for start, length in ranges]
+            lengths = array("q")
+            overflow = {}
+            for index, (length, data) in enumerate(self._get_pool(n_processes).imap(_preprocess_shared_range, tasks)):
+                lengths.append(length)
+                if data is not None:
+                    overflow[index] = data
+
+            result = bytearray()
+            for index, ((start, _), length) in enumerate(zip(ranges, lengths)):
+                result += overflow[index] if length < 0 else block.buf[start:start + length]
+            return result.decode("utf-8", "surrogatepass")
+        finally:
+            block.close()
+            block.unlink()
+
+    def _split_ranges(self, encoded, n_processes):
+        # A few ranges per worker, each ending just after a paragraph break
+        # ("\n\n" never occurs inside a multi-byte UTF-8 sequence).
+        task_bytes = max(self.min_task_bytes, len(encoded) // (n_processes * 4))
+        ranges = []
+        start = 0
+        while start < len(encoded):
+            cut = encoded.find(b"\n\n", start + task_bytes)
+            end = len(encoded) if cut == -1 else cut + 2
+            ranges.append((start, end - start))
+            start = end
+        return ranges
+
+    def _get_pool(self, n_processes):
+        # Started on first use and kept for later calls; a different size
+        # replaces it.
+        with self._pool_lock:
+            if self._pool is not None and self._pool_size != n_processes:
+                self._close_pool()
+            if self._pool is None:
+                self._pool = multiprocessing.Pool(
+                    processes=n_processes,
+                    initializer=_init_preprocess_worker,
+                    initargs=(self.rules(),),
+                )
+                self._pool_size = n_processes
+                _live_preprocessors.add(self)
+            return self._pool
+
+    def shutdown(self):
+        with self._pool_lock:
+            self._close_pool()
+
+    def _close_pool(self):
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+            self._pool_size = 0
+            _live_preprocessors.discard(self)
+
+    def __getstate__(self):
+        # Only the rules travel to other processes, never the pool
+        return self.rules()
+
+    def __setstate__(self, rules):
+        self.__init__(**rules)
 
 
 class SystemChecker:
     @staticmethod
     def check_hardware():
+        # Imported here so worker processes, which import this module, do
+        # not pay for loading torch
+        import torch
+
         gpu_available = torch.cuda.is_available()
         cpu_cores = multiprocessing.cpu_count()
         return gpu_available, cpu_cores
@@ -1,3 +1,10 @@
+from multiprocessing import freeze_support
+
+if __name__ == "__main__":
+    # Before the heavy imports below, so worker processes of the frozen app
+    # exit here instead of loading PyQt and the models
+    freeze_support()
+
 import re
 import sys
 import colors
@@ -21,10 +28,12 @@ from PyQt6.QtWidgets import (
 )
 from PyQt6.QtGui import QPalette, QColor, QPainter, QFont, QPixmap, QPen
 from PyQt6.QtSvgWidgets import QSvgWidget
-from extraction import FileChecker, TextExtractor, TextPreprocessor, SystemChecker
-from SummaryEngine import SummarizationPipeline
-from multiprocessing import freeze_support
+from extraction import (
+    FileChecker, FileCheckError, TextExtractor, TextPreprocessor, SystemChecker, shutdown_preprocessor_pools
+)
+from SummaryEngine import SummarizationPipeline, SummaryCache, SummarizationCancelled
 import concurrent.futures
+import threading
 
 logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -201,7 +210,7 @@ class FileNameWithSpinner(QWidget):
         self.spinner_widget.setFixedSize(40, 40)
         layout.addWidget(self.spinner_widget)
 
-        # Summarising text on the right
+        # Status text on the right
         self.file_name_label = QLabel("Summarising")
         self.file_name_label.setStyleSheet(
             "font-family: 'Inter'; font-size: 14px; color: black;"  # Adjust size and color as needed
@@ -211,10 +220,14 @@ class FileNameWithSpinner(QWidget):
         self.setLayout(layout)
         self.hide()  # Initially hide the widget
 
-    def start_loading(self):
+    def start_loading(self, status="Summarising"):
+        self.file_name_label.setText(status)
         self.spinner_widget.start()
         self.show()
 
+    def set_status(self, status):
+        self.file_name_label.setText(status)
+
     def stop_loading(self):
         self.spinner_widget.stop()
         self.hide()
@@ -256,18 +269,69 @@ class HoverButton(QPushButton):
         self.setStyleSheet(self.normal_style)
 
 
+class ExtractionWorker(QThread):
+    page_extracted = pyqtSignal(int, int)  # Page number, total pages (0 while unknown)
+    extraction_done = pyqtSignal(str, int)  # Extracted text, total pages
+    error_occurred = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, file_path):
+        super().__init__()
+        self.file_path = file_path
+
+    @staticmethod
+    def expected_total(file_checker, page_number):
+        # DOCX totals are only final after the last page, so the metadata
+        # count is shown instead, or none once reading has gone past it
+        expected = file_checker.expected_pages
+        return expected if expected and expected >= page_number else 0
+
+    def run(self):
+        # Validation and extraction are the same pass over the pages, so a
+        # bad page stops the work as soon as it is reached.  Pages are decoded
+        # serially: for files within the page limit a worker pool costs more
+        # to start than it saves.
+        file_checker = FileChecker(self.file_path)
+        pages = None
+        try:
+            pages = file_checker.iter_pages()
+            page_texts = []
+            for page_number, text in pages:
+                if self.isInterruptionRequested():
+                    self.cancelled.emit()
+                    return
+                page_texts.append(file_checker.format_page(page_number, text))
+                self.page_extracted.emit(page_number, self.expected_total(file_checker, page_number))
+            self.extraction_done.emit("".join(page_texts), file_checker.total_pages)
+        except FileCheckError as e:
+            self.error_occurred.emit(str(e))
+        except Exception as e:
+            logging.error(f"Error processing file: {e}")
+            self.error_occurred.emit(f"Error processing file: {e}")
+        finally:
+            if pages is not None:
+                pages.close()  # Closes the document and any decoding workers
+
+
 class SummarizationWorker(QThread):
     summarization_done = pyqtSignal(str)
     error_occurred = pyqtSignal(str)
+    progress_changed = pyqtSignal(object)  # SummaryProgress
+    cancelled = pyqtSignal()
 
-    def __init__(self, text, total_pages, summary_level, n_processes):
+    def __init__(self, text, total_pages, summary_level, n_processes, preprocessor):
         super().__init__()
         self.text = text
         self.total_pages = total_pages
         self.summary_level = summary_level
         self.n_processes = n_processes
-        self.preprocessor = TextPreprocessor()
-        self.pipeline = SummarizationPipeline()
+        self.preprocessor = preprocessor
+        self.pipeline = SummarizationPipeline(cache=SummaryCache())
+        self.cancel_event = threading.Event()
+
+    def cancel(self):
+        # Generation stops at its next decoding step
+        self.cancel_event.set()
 
     def run(self):
         try:
@@ -278,26 +342,44 @@ class SummarizationWorker(QThread):
                 )
             else:
                 text = self.preprocessor.preprocess(self.text)
+            if self.cancel_event.is_set():
+                raise SummarizationCancelled()
 
             # Check system hardware
             gpu_available, cpu_cores = SystemChecker.check_hardware()
 
             if gpu_available:
                 # Use GPU for summarization
-                summary = self.pipeline.summarize(text, self.summary_level)
+                summary = self.pipeline.summarize(
+                    text,
+                    self.summary_level,
+                    progress=self.progress_changed.emit,
+                    cancel_event=self.cancel_event
+                )
             else:
                 # Use CPU for summarization
                 with concurrent.futures.ThreadPoolExecutor() as executor:
                     future = executor.submit(
                         self.pipeline.summarize,
                         text,
-                        self.summary_level
+                        self.summary_level,
+                        progress=self.progress_changed.emit,
+                        cancel_event=self.cancel_event
                     )
                     summary = future.result()
 
+            if self.pipeline.last_report is not None:
+                logging.info(self.pipeline.last_report.format())
             self.summarization_done.emit(summary)
+        except SummarizationCancelled:
+            logging.info("Summarization cancelled.")
+            self.cancelled.emit()
         except Exception as e:
             self.error_occurred.emit(str(e))
+        finally:
+            # Models are shared through the registry; release this worker's
+            # references so they can be evicted once nobody needs them.
+            self.pipeline.close()
 
 
 class BottomRightWidget(RoundedRectWidget):
@@ -305,13 +387,19 @@ class BottomRightWidget(RoundedRectWidget):
         super().__init__(color)
         self.parent_layout = parent_layout
         self.file_path = None
+        self.total_pages = 0
         self.file_label = None
         self.file_name_with_spinner = FileNameWithSpinner()
         self.upload_button = None
         self.worker = None
+        self.extraction_worker = None
+        self.finishing_workers = set()
+        self.summarize_when_extracted = False
         self.text_extractor = (
             TextExtractor()
         )  # Initialize the TextExtractor without a file path
+        # Owned here so its worker pool survives between summaries
+        self.text_preprocessor = TextPreprocessor.sentence_preserving()
         self.pipeline = SummarizationPipeline()
         self.initUI()
 
@@ -421,26 +509,37 @@ class BottomRightWidget(RoundedRectWidget):
             self.show_file_info(self.file_path)
 
     def show_file_info(self, filename):
-        file_checker = FileChecker(filename)
-        file_type = self.parent_layout.file_type  # 0 if PDF, 1 if DOCX
+        # Parsing runs on a worker thread so the window stays responsive;
+        # the spinner shows page progress meanwhile.
+        self.upload_button.disable_button()
+        self.file_name_with_spinner.start_loading("Reading file")
 
-        if file_type == 0:
-            is_valid, message = file_checker.check_pdf()
-        else:
-            is_valid, message = file_checker.check_docx()
+        self.extraction_worker = ExtractionWorker(filename)
+        self.extraction_worker.page_extracted.connect(self.handle_page_extracted)
+        self.extraction_worker.extraction_done.connect(self.handle_extraction_done)
+        self.extraction_worker.error_occurred.connect(self.handle_extraction_error)
+        self.extraction_worker.start()
 
-        if not is_valid:
-            error_box = QMessageBox()
-            error_box.setIcon(QMessageBox.Icon.Warning)
-            error_box.setText(message)
-            error_box.setWindowTitle("File Error")
-            error_box.exec()
+    def handle_page_extracted(self, page_number, total_pages):
+        if self.sender() is not self.extraction_worker:
             return
+        if total_pages:
+            self.file_name_with_spinner.set_status(f"Reading page {page_number} of {total_pages}")
+        else:
+            self.file_name_with_spinner.set_status(f"Reading page {page_number}")
+
+    def handle_extraction_done(self, text, total_pages):
+        if self.sender() is not self.extraction_worker:
+            return  # A cleared file finishing late
+        self._retire_extraction_worker()
+        self.file_name_with_spinner.stop_loading()
 
         # Save text into the in-memory text extractor
-        success = self.text_extractor.save_text(file_checker.extracted_text.getvalue())
+        success = self.text_extractor.save_text(text)
 
         if not success:
+            self.summarize_when_extracted = False
+            self.upload_button.enable_button()
             error_box = QMessageBox()
             error_box.setIcon(QMessageBox.Icon.Warning)
             error_box.setText("Failed to save extracted text from the document.")
@@ -448,20 +547,67 @@ class BottomRightWidget(RoundedRectWidget):
             error_box.exec()
             return
 
-        self.file_label.show_file_info(filename)
-        self.upload_button.disable_button()
+        self.total_pages = total_pages
+        self.file_label.show_file_info(self.file_path)
+        if self.summarize_when_extracted:
+            self.summarize_when_extracted = False
+            self.summarize_file()
+
+    def handle_extraction_error(self, message):
+        if self.sender() is not self.extraction_worker:
+            return
+        self._retire_extraction_worker()
+        self.summarize_when_extracted = False
+        self.file_path = None
+        self.file_name_with_spinner.stop_loading()
+        self.upload_button.enable_button()
+
+        error_box = QMessageBox()
+        error_box.setIcon(QMessageBox.Icon.Warning)
+        error_box.setText(message)
+        error_box.setWindowTitle("File Error")
+        error_box.exec()
+
+    def _retire_extraction_worker(self):
+        self._retire_worker(self.extraction_worker)
+        self.extraction_worker = None
+
+    def _retire_worker(self, worker):
+        # The thread may still be unwinding; keep a reference until it has
+        # finished so Qt does not destroy it while running.
+        self.finishing_workers.add(worker)
+        worker.finished.connect(lambda: self.finishing_workers.discard(worker))
+        if worker.isFinished():
+            self.finishing_workers.discard(worker)
 
     def clear_file(self):
+        if self.extraction_worker is not None:
+            # Its late signals are ignored once it is no longer current
+            self.extraction_worker.requestInterruption()
+            self._retire_extraction_worker()
+            self.file_name_with_spinner.stop_loading()
+        if self.worker is not None and self.worker.isRunning():
+            # Abort the running summary; its late signals are ignored
+            self.worker.cancel()
+            self._retire_worker(self.worker)
+            self.worker = None
+            self.file_name_with_spinner.stop_loading()
+        self.summarize_when_extracted = False
         self.file_path = None
         self.file_label.hide_file_info()
         self.upload_button.enable_button()
 
         # Clear the in-memory text extractor
-        self.text_extractor.text.truncate(0)  # Clear the text buffer
+        self.text_extractor.clear_text()
+        self.total_pages = 0
         logging.info("Text buffer cleared.")
 
     def summarize_file(self):
-        if self.file_path:
+        if self.file_path and self.extraction_worker is not None:
+            # Start as soon as the file has been read
+            self.summarize_when_extracted = True
+            logging.info("Summarization will start once the file has been read.")
+        elif self.file_path:
             try:
                 # Hide the tick mark widget and start the spinner immediately
                 self.file_label.hide_file_info()
@@ -471,17 +617,10 @@ class BottomRightWidget(RoundedRectWidget):
                 summary_level = self.parent_layout.summary_type
                 summary_levels = {0: "short", 1: "medium", 2: "long"}
     
-                # Check the file and extract text
-                file_checker = FileChecker(self.file_path)
-                valid, message = file_checker.check_file()
-                if not valid:
-                    logging.error(message)
-                    self.file_name_with_spinner.stop_loading()  # Stop spinner if file is invalid
-                    return
-
-                # Get the text from the file checker
-                text = file_checker.extracted_text.getvalue()
-                total_pages = file_checker.total_pages
+                # The file was validated and extracted when it was selected,
+                # so reuse that text instead of parsing the document again
+                text = self.text_extractor.get_text()
+                total_pages = self.total_pages
 
                 # Check system hardware
                 gpu_available, cpu_cores = SystemChecker.check_hardware()
@@ -492,10 +631,12 @@ class BottomRightWidget(RoundedRectWidget):
                     text,
                     total_pages,
                     summary_levels[summary_level],
-                    n_processes
+                    n_processes,
+                    self.text_preprocessor
                 )
                 self.worker.summarization_done.connect(self.handle_summary_done)
-                self.worker.error_occurred.connect(self.handle_summary_error)
+                self.worker.error_occurred.connect(self.handle_worker_error)
+                self.worker.progress_changed.connect(self.handle_summary_progress)
                 self.worker.start()
 
             except Exception as e:
@@ -504,7 +645,20 @@ class BottomRightWidget(RoundedRectWidget):
         else:
             logging.info("No file selected.")
 
+    def handle_summary_progress(self, progress):
+        if self.sender() is not self.worker:
+            return
+        status = "Summarising"
+        if progress.sections_total:
+            status += f" {progress.sections_done} of {progress.sections_total}"
+        if progress.eta_seconds is not None:
+            status += f", about {max(1, round(progress.eta_seconds / 60))} min left"
+        self.file_name_with_spinner.set_status(status)
+
     def handle_summary_done(self, summary):
+        if self.sender() is not self.worker:
+            return  # Finished just after being cancelled
+
         # Extract the base name of the file path
         base_name = os.path.basename(self.file_path)
 
@@ -536,6 +690,10 @@ class BottomRightWidget(RoundedRectWidget):
         self.file_name_with_spinner.stop_loading()
         self.file_label.show_file_info(self.file_path)
 
+    def handle_worker_error(self, error_message):
+        if self.sender() is self.worker:
+            self.handle_summary_error(error_message)
+
     def handle_summary_error(self, error_message):
         logging.error(f"An error occurred: {error_message}")
 
@@ -812,8 +970,8 @@ class MainWindow(QMainWindow):
 
 
 if __name__ == "__main__":
-    freeze_support()
     app = QApplication(sys.argv)
+    app.aboutToQuit.connect(shutdown_preprocessor_pools)
     window = MainWindow()
     window.show()
     sys.exit(app.exec())
@@ -0,0 +1,340 @@
+import sys
+import json
+import time
+import uuid
+import asyncio
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing import freeze_support
+from extraction import FileChecker, TextPreprocessor
+from SummaryEngine import (
+    SummarizationPipeline, SummaryCache, SummarizationCancelled, SUMMARIZATION_ERROR, INFERENCE_BACKENDS
+)
+
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
+)
+
+SUMMARY_LEVELS = ("short", "medium", "long")
+SUMMARY_MODES = ("sections", "hierarchical")
+REASONS = {
+    200: "OK",
+    202: "Accepted",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    409: "Conflict",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class Job:
+    def __init__(self, level, text=None, path=None, mode="sections"):
+        self.id = uuid.uuid4().hex
+        self.level = level
+        self.mode = mode
+        self.text = text
+        self.path = path
+        self.status = "queued"
+        self.summary = None
+        self.profile = None
+        self.progress = None
+        self.cancel_event = threading.Event()
+        self.error = None
+        self.submitted = time.time()
+        self.started = None
+        self.finished = None
+
+    def describe(self):
+        return {
+            "id": self.id,
+            "status": self.status,
+            "level": self.level,
+            "mode": self.mode,
+            "path": self.path,
+            "error": self.error,
+            "profile": self.profile,
+            "progress": self.progress,
+            "submitted": self.submitted,
+            "started": self.started,
+            "finished": self.finished,
+        }
+
+
+class HttpError(Exception):
+    def __init__(self, status, message, headers=None):
+        super().__init__(message)
+        self.status = status
+        self.headers = headers or {}
+
+
+class SummarizationService:
+    """Local HTTP front end for SummarizationPipeline.
+
+    Jobs go into a bounded queue that a fixed set of inference workers
+    drain.  Each worker keeps its own pipeline for the life of the
+    service, so models stay warm between requests.  When the queue is
+    full, new submissions get 503 with Retry-After instead of piling up.
+    """
+
+    def __init__(self, workers=1, queue_size=16, max_pages=50, use_cache=True,
+                 max_finished_jobs=1000, max_body_bytes=20 * 1024 * 1024, backend="torch",
+                 ocr=False):
+        self.workers = workers
+        self.ocr = ocr
+        self.queue_size = queue_size
+        self.max_pages = max_pages
+        self.max_finished_jobs = max_finished_jobs
+        self.max_body_bytes = max_body_bytes
+        self.jobs = OrderedDict()
+        self.queue = None
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.preprocessor = TextPreprocessor.sentence_preserving()
+
+        cache = SummaryCache() if use_cache else None
+        logging.info(f"Warming {workers} inference workers...")
+        self.pipelines = [
+            SummarizationPipeline(cache=cache, backend=backend) for _ in range(workers)
+        ]
+
+    async def serve(self, host="127.0.0.1", port=8765):
+        self.queue = asyncio.Queue(maxsize=self.queue_size)
+        worker_tasks = [
+            asyncio.create_task(self._worker(pipeline)) for pipeline in self.pipelines
+        ]
+        server = await asyncio.start_server(self._handle_connection, host, port)
+        logging.info(f"Summarization service listening on http://{host}:{port}")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            for task in worker_tasks:
+                task.cancel()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            for pipeline in self.pipelines:
+                pipeline.close()
+
+    # Job handling
+
+    def submit(self, payload):
+        level = payload.get("level", "medium")
+        if not isinstance(level, str) or level not in SUMMARY_LEVELS:
+            raise HttpError(400, f"level must be one of {', '.join(SUMMARY_LEVELS)}.")
+        mode = payload.get("mode", "sections")
+        if not isinstance(mode, str) or mode not in SUMMARY_MODES:
+            raise HttpError(400, f"mode must be one of {', '.join(SUMMARY_MODES)}.")
+        text, path = payload.get("text"), payload.get("path")
+        for name, value in (("text", text), ("path", path)):
+            if value is not None and not (isinstance(value, str) and value):
+                raise HttpError(400, f"'{name}' must be a non-empty string.")
+        if bool(text) == bool(path):
+            raise HttpError(400, "Provide exactly one of 'text' or 'path'.")
+
+        if path:
+            # Metadata only, so oversized or unreadable files fail fast
+            preflight = FileChecker(path, self.max_pages).preflight()
+            if not preflight.accepted:
+                raise HttpError(400, preflight.message)
+
+        job = Job(level, text=text, path=path, mode=mode)
+        try:
+            self.queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise HttpError(503, "Job queue is full, try again later.", {"Retry-After": "30"})
+        self.jobs[job.id] = job
+        self._forget_finished_jobs()
+        return job
+
+    def _forget_finished_jobs(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.finished]
+        for job_id in finished[: max(0, len(finished) - self.max_finished_jobs)]:
+            del self.jobs[job_id]
+
+    async def _worker(self, pipeline):
+        loop = asyncio.get_running_loop()
+        while True:
+            job = await self.queue.get()
+            if job.cancel_event.is_set():
+                # Cancelled while still queued
+                job.text = None
+                self.queue.task_done()
+                continue
+            job.status = "running"
+            job.started = time.time()
+            try:
+                job.summary = await loop.run_in_executor(self.executor, self._run_job, pipeline, job)
+                job.status = "done"
+            except SummarizationCancelled:
+                logging.info(f"Job {job.id} cancelled")
+                job.status = "cancelled"
+            except Exception as e:
+                logging.error(f"Job {job.id} failed: {e}")
+                job.status = "failed"
+                job.error = str(e)
+            finally:
+                job.finished = time.time()
+                job.text = None  # The summary is all that is needed from now on
+                self.queue.task_done()
+
+    def _run_job(self, pipeline, job):
+        def report(progress):
+            job.progress = progress._asdict()
+
+        if job.path:
+            # Summarization starts while later pages are still being read;
+            # a page failing validation fails the job.
+            pages = FileChecker(job.path, self.max_pages, ocr=self.ocr).iter_pages()
+            try:
+                summary = pipeline.summarize_pages(
+                    pages, job.level, job.mode, progress=report, cancel_event=job.cancel_event,
+                    preprocess=self.preprocessor.preprocess,
+                )
+            finally:
+                pages.close()
+        else:
+            summary = pipeline.summarize(
+                self.preprocessor.preprocess(job.text), job.level, job.mode,
+                progress=report, cancel_event=job.cancel_event,
+            )
+        job.profile = pipeline.last_report.as_dict()
+        if summary == SUMMARIZATION_ERROR:
+            raise RuntimeError(summary)
+        return summary
+
+    def cancel(self, job):
+        if job.finished or job.status == "cancelled":
+            raise HttpError(409, f"Job {job.id} is {job.status}.")
+        # A running job stops at its next generation step
+        job.cancel_event.set()
+        if job.status == "queued":
+            job.status = "cancelled"
+            job.finished = time.time()
+        return job
+
+    def _get_job(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None:
+            raise HttpError(404, f"Unknown job {job_id}.")
+        return job
+
+    # HTTP
+
+    def route(self, method, path, body):
+        parts = [part for part in path.split("?")[0].split("/") if part]
+        if parts == ["health"] and method == "GET":
+            return 200, {
+                "status": "ok",
+                "workers": self.workers,
+                "queued": self.queue.qsize(),
+                "queue_size": self.queue_size,
+            }
+        if parts == ["jobs"] and method == "POST":
+            try:
+                payload = json.loads(body or b"{}")
+            except ValueError:
+                raise HttpError(400, "Request body must be JSON.")
+            if not isinstance(payload, dict):
+                raise HttpError(400, "Request body must be a JSON object.")
+            job = self.submit(payload)
+            return 202, job.describe()
+        if len(parts) == 2 and parts[0] == "jobs" and method == "GET":
+            return 200, self._get_job(parts[1]).describe()
+        if len(parts) == 2 and parts[0] == "jobs" and method == "DELETE":
+            return 202, self.cancel(self._get_job(parts[1])).describe()
+        if len(parts) == 3 and parts[0] == "jobs" and parts[2] == "result" and method == "GET":
+            job = self._get_job(parts[1])
+            if job.status == "failed":
+                raise HttpError(500, job.error)
+            if job.status != "done":
+                raise HttpError(409, f"Job {job.id} is {job.status}.")
+            return 200, {"id": job.id, "level": job.level, "summary": job.summary}
+        if parts and parts[0] in ("jobs", "health"):
+            raise HttpError(405, f"{method} is not allowed on {path}.")
+        raise HttpError(404, f"No route for {path}.")
+
+    async def _handle_connection(self, reader, writer):
+        headers = {}
+        try:
+            try:
+                request_line = (await reader.readline()).decode("latin-1").strip()
+                method, path, _ = request_line.split(" ", 2)
+                while True:
+                    line = (await reader.readline()).decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                if length > self.max_body_bytes:
+                    raise HttpError(413, "Request body too large.")
+                body = await reader.readexactly(length) if length else b""
+                status, payload = self.route(method.upper(), path, body)
+                extra_headers = {}
+            except HttpError as e:
+                status, payload, extra_headers = e.status, {"error": str(e)}, e.headers
+            except (ValueError, asyncio.IncompleteReadError):
+                status, payload, extra_headers = 400, {"error": "Malformed HTTP request."}, {}
+            except Exception as e:
+                # Never drop a connection without an answer
+                logging.error(f"Unhandled error while serving a request: {e}")
+                status, payload, extra_headers = 500, {"error": "Internal server error."}, {}
+            await self._respond(writer, status, payload, extra_headers)
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _respond(writer, status, payload, extra_headers):
+        body = json.dumps(payload).encode("utf-8")
+        head = [
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+            "Content-Type: application/json",
+            f"Content-Length: {len(body)}",
+            "Connection: close",
+        ]
+        head.extend(f"{name}: {value}" for name, value in extra_headers.items())
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the summarizer as a local HTTP service.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("-w", "--workers", type=int, default=1, help="Inference workers kept warm")
+    parser.add_argument("--queue-size", type=int, default=16, help="Jobs accepted before returning 503")
+    parser.add_argument("--max-pages", type=int, default=50, help="Page limit per file, 0 for no limit")
+    parser.add_argument("--no-cache", action="store_true", help="Do not use the on-disk summary cache")
+    parser.add_argument("--backend", choices=sorted(INFERENCE_BACKENDS), default="torch",
+                        help="Abstractive inference backend (int8 and onnx are faster on CPU)")
+    parser.add_argument("--ocr", action="store_true",
+                        help="OCR PDF pages without a text layer (needs pytesseract and Tesseract)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    service = SummarizationService(
+        workers=args.workers,
+        queue_size=args.queue_size,
+        max_pages=args.max_pages or None,
+        use_cache=not args.no_cache,
+        backend=args.backend,
+        ocr=args.ocr,
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    freeze_support()
+    sys.exit(main())
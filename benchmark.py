@@ -0,0 +1,304 @@
+import os
+import sys
+import glob
+import json
+import gc
+import time
+import random
+import platform
+import argparse
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CORPUS = [
+    os.path.join(SCRIPT_DIR, "documents", "pdf"),
+    os.path.join(SCRIPT_DIR, "documents", "word"),
+]
+SUMMARY_LEVELS = ("short", "medium", "long")
+
+# Metrics compared against a baseline: (path inside a document result, higher is better)
+TRACKED_METRICS = [
+    (("extraction", "pages_per_second"), True),
+    (("preprocessing", "mb_per_second"), True),
+]
+TRACKED_SUMMARY_METRICS = [
+    (("seconds",), False),
+    (("profile", "peak_rss_mb"), False),
+    (("profile", "counters", "generate_calls"), False),
+]
+
+
+def collect_documents(inputs):
+    files = []
+    for item in inputs:
+        pattern = os.path.join(item, "*") if os.path.isdir(item) else item
+        files.extend(path for path in glob.glob(pattern)
+                     if path.lower().endswith((".pdf", ".docx", ".doc")))
+    return sorted(set(files))
+
+
+def seed_everything(seed):
+    random.seed(seed)
+    import numpy as np
+    import torch
+    np.random.seed(seed)
+    torch.manual_seed(seed)
+
+
+def bench_extraction(file_path, max_pages, n_processes):
+    from app.extraction import FileChecker
+
+    start = time.perf_counter()
+    file_checker = FileChecker(file_path, max_pages, n_processes=n_processes)
+    is_valid, message = file_checker.check_file()
+    seconds = time.perf_counter() - start
+    text = file_checker.extracted_text.getvalue()
+    result = {
+        "valid": is_valid,
+        "message": message,
+        "pages": file_checker.total_pages,
+        "chars": len(text),
+        "seconds": round(seconds, 4),
+        "pages_per_second": round(file_checker.total_pages / seconds, 2) if seconds else None,
+    }
+    return result, text
+
+
+def legacy_preprocess(text):
+    # The per-character filter TextPreprocessor.preprocess used to run,
+    # kept as the reference for speed and output comparisons.
+    text = text.lower()
+    return "".join([char for char in text if char.isalnum() or char.isspace()])
+
+
+def best_time(function, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = function(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings), output
+
+
+def bench_preprocessing(text, repeat):
+    from app.extraction import TextPreprocessor
+
+    megabytes = len(text.encode("utf-8")) / 2**20
+    seconds, processed = best_time(TextPreprocessor().preprocess, text, repeat)
+    legacy_seconds, legacy_processed = best_time(legacy_preprocess, text, repeat)
+    # The summarizer is fed the sentence-preserving output, as in the app
+    sentence_seconds, summarizer_text = best_time(TextPreprocessor.sentence_preserving().preprocess, text, repeat)
+    result = {
+        "chars": len(text),
+        "seconds": round(seconds, 4),
+        "mb_per_second": round(megabytes / seconds, 2) if seconds else None,
+        "legacy_seconds": round(legacy_seconds, 4),
+        "speedup": round(legacy_seconds / seconds, 1) if seconds else None,
+        "matches_legacy": processed == legacy_processed,
+        "sentence_preserving_seconds": round(sentence_seconds, 4),
+    }
+    return result, summarizer_text
+
+
+def bench_summarization(pipeline, text, level, mode):
+    start = time.perf_counter()
+    summary = pipeline.summarize(text, level, mode)
+    return {
+        "seconds": round(time.perf_counter() - start, 3),
+        "summary_words": len(summary.split()),
+        "profile": pipeline.last_report.as_dict(),
+    }
+
+
+def make_pipeline(options):
+    from app.SummaryEngine import SummarizationPipeline
+
+    # The summary cache stays off: a cache hit would measure nothing
+    start = time.perf_counter()
+    pipeline = SummarizationPipeline(options["bart_model"], options["sentence_model"],
+                                     cache=None, backend=options["backend"])
+    return pipeline, round(time.perf_counter() - start, 3)
+
+
+def evict_models():
+    from app.SummaryEngine import model_registry
+
+    model_registry.evict()
+    gc.collect()
+
+
+def bench_document(file_path, levels, options, pipeline=None):
+    seed_everything(options["seed"])
+    extraction, text = bench_extraction(file_path, options["max_pages"], options["n_processes"])
+    result = {"file": os.path.relpath(file_path, SCRIPT_DIR), "extraction": extraction, "summaries": {}}
+    if not extraction["valid"]:
+        return result
+
+    result["preprocessing"], text = bench_preprocessing(text, options["repeat"])
+    for level in levels:
+        seed_everything(options["seed"])
+        if pipeline is None:
+            # Cold runs pay for model loading at every level.  Closing a
+            # pipeline only releases its registry references, so the models
+            # are evicted as well or the next level would reuse them.
+            level_pipeline, load_seconds = make_pipeline(options)
+            try:
+                summary = bench_summarization(level_pipeline, text, level, options["mode"])
+            finally:
+                level_pipeline.close()
+                evict_models()
+            summary["load_seconds"] = load_seconds
+        else:
+            summary = bench_summarization(pipeline, text, level, options["mode"])
+        result["summaries"][level] = summary
+    return result
+
+
+def run_cold(files, levels, options):
+    # Every document runs in its own spawned process, starting from a clean
+    # interpreter; within it the models are reloaded for every level.
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for file_path in files:
+        with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+            results.append(executor.submit(bench_document, file_path, levels, options).result())
+        print_progress(results[-1])
+    return results
+
+
+def run_warm(files, levels, options):
+    pipeline, load_seconds = make_pipeline(options)
+    try:
+        # One throwaway run so lazy initialisation is not charged to the first file
+        seed_everything(options["seed"])
+        pipeline.summarize("WARM UP:\nThe benchmark warms the models up before timing. " * 20, "short")
+        results = []
+        for file_path in files:
+            results.append(bench_document(file_path, levels, options, pipeline))
+            print_progress(results[-1])
+    finally:
+        pipeline.close()
+    return results, load_seconds
+
+
+def print_progress(result):
+    extraction = result["extraction"]
+    if not extraction["valid"]:
+        print(f"{result['file']}: skipped ({extraction['message']})")
+        return
+    timings = ", ".join(f"{level} {summary['seconds']}s" for level, summary in result["summaries"].items())
+    print(f"{result['file']}: {extraction['pages']} pages at {extraction['pages_per_second']} pages/s, "
+          f"preprocessing {result['preprocessing']['mb_per_second']} MB/s "
+          f"({result['preprocessing']['speedup']}x legacy), {timings}")
+
+
+def lookup(data, path):
+    for key in path:
+        if not isinstance(data, dict) or key not in data:
+            return None
+        data = data[key]
+    return data
+
+
+def compare_to_baseline(results, baseline, tolerance):
+    # Returns (metric name, baseline, current, relative change) for every
+    # tracked metric that got worse by more than the tolerance.
+    baseline_documents = {document["file"]: document for document in baseline["documents"]}
+    regressions = []
+
+    def check(name, old, new, higher_is_better):
+        if old in (None, 0) or new is None:
+            return
+        change = (new - old) / old
+        if (-change if higher_is_better else change) > tolerance:
+            regressions.append((name, old, new, round(change, 3)))
+
+    for document in results["documents"]:
+        previous = baseline_documents.get(document["file"])
+        if previous is None:
+            continue
+        for path, higher_is_better in TRACKED_METRICS:
+            check(f"{document['file']} {'.'.join(path)}",
+                  lookup(previous, path), lookup(document, path), higher_is_better)
+        for level, summary in document["summaries"].items():
+            for path, higher_is_better in TRACKED_SUMMARY_METRICS:
+                check(f"{document['file']} {level} {'.'.join(path)}",
+                      lookup(previous, ("summaries", level) + path), lookup(summary, path), higher_is_better)
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(
+        description="Benchmark extraction, preprocessing and summarization over the documents corpus."
+    )
+    parser.add_argument("inputs", nargs="*", default=DEFAULT_CORPUS, help="Folders or glob patterns of documents")
+    parser.add_argument("-l", "--levels", nargs="+", choices=SUMMARY_LEVELS, default=list(SUMMARY_LEVELS))
+    parser.add_argument("--models", choices=["warm", "cold"], default="warm",
+                        help="warm reuses loaded models across files; cold loads them in a fresh process per file")
+    parser.add_argument("--mode", choices=["sections", "hierarchical"], default="sections")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3, help="Preprocessing repetitions, the fastest is kept")
+    parser.add_argument("--max-pages", type=int, default=50, help="Page limit per file, 0 for no limit")
+    parser.add_argument("--processes", type=int, default=1, help="Processes used to decode PDF pages")
+    parser.add_argument("--bart-model", default=None, help="Model name or local path for the abstractive model")
+    parser.add_argument("--sentence-model", default=None, help="Model name or local path for sentence embeddings")
+    parser.add_argument("--backend", default="torch", help="Abstractive inference backend")
+    parser.add_argument("--offline", action="store_true", help="Never contact the Hugging Face hub")
+    parser.add_argument("-o", "--output", help="Write results to this JSON file")
+    parser.add_argument("--baseline", help="Compare against a JSON file written by an earlier run")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative regression, 0.1 = 10%%")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.offline:
+        # Must be set before transformers is imported, including in spawned workers
+        os.environ["HF_HUB_OFFLINE"] = "1"
+        os.environ["TRANSFORMERS_OFFLINE"] = "1"
+    from app.SummaryEngine import BART_MODEL_NAME, SENTENCE_MODEL_NAME
+
+    files = collect_documents(args.inputs)
+    if not files:
+        print("No documents matched the given inputs.", file=sys.stderr)
+        return 2
+
+    options = {
+        "seed": args.seed,
+        "repeat": max(1, args.repeat),
+        "max_pages": args.max_pages or None,
+        "n_processes": args.processes,
+        "mode": args.mode,
+        "backend": args.backend,
+        "bart_model": args.bart_model or BART_MODEL_NAME,
+        "sentence_model": args.sentence_model or SENTENCE_MODEL_NAME,
+    }
+    results = {
+        "meta": dict(options, models=args.models, levels=args.levels, python=platform.python_version(),
+                     platform=platform.platform(), started=time.strftime("%Y-%m-%dT%H:%M:%S")),
+    }
+    if args.models == "cold":
+        results["documents"] = run_cold(files, args.levels, options)
+    else:
+        results["documents"], results["meta"]["load_seconds"] = run_warm(files, args.levels, options)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as output_file:
+            json.dump(results, output_file, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as baseline_file:
+            regressions = compare_to_baseline(results, json.load(baseline_file), args.tolerance)
+        for name, old, new, change in regressions:
+            print(f"REGRESSION {name}: {old} -> {new} ({change:+.1%})")
+        if regressions:
+            return 1
+        print("No regressions against the baseline.")
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
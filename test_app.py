@@ -1,9 +1,31 @@
 import unittest
 import os
+import json
+import asyncio
+import math
 import time
+import threading
+import tempfile
+import subprocess
+import sys
+import fitz
+import numpy as np
+import torch
 from random import choice
-from app.extraction import FileChecker , TextPreprocessor , SystemChecker
-from app.SummaryEngine import SummarizationPipeline
+from unittest import mock
+from app.extraction import FileChecker , FileCheckError , TextPreprocessor , SystemChecker , ocr_available , LanguageVerifier
+from app.SummaryEngine import (
+    SummarizationPipeline, ModelRegistry, SummaryCache, ImprovedFactChecker, measure_backend_drift,
+    TokenAwareChunker, acquire_bart_tokenizer, PipelineProfiler, ProgressMonitor, SummarizationCancelled,
+    SUMMARIZATION_ERROR, ExportedGraphBackend, BART_MODEL_NAME, SentenceEmbeddingStore, ImprovedPostprocessor,
+    get_backend, ImprovedAbstractiveSummarizer, ImprovedTechnicalTermExtractor
+)
+from benchmark import compare_to_baseline, evict_models
+
+# batch.py imports its siblings the way it is run, from inside app/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+from batch import collect_files, output_name, Manifest, BatchRunner
+from service import SummarizationService
 
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
@@ -73,6 +95,130 @@ class TestFileChecker(unittest.TestCase):
                 elif 'Spanish' in file_name:
                     self.assertFalse(is_valid)
     
+    def test_iter_pages_streams_in_order(self):
+        file_name = self.test_files_dir['pdf-summary'][1]
+        file_checker = FileChecker(file_name, self.max_pages)
+        page_numbers = [page_number for page_number, _ in file_checker.iter_pages()]
+        self.assertEqual(page_numbers, list(range(1, file_checker.total_pages + 1)))
+
+        scanned_checker = FileChecker(self.test_files_dir['pdf'][2], self.max_pages)
+        with self.assertRaises(FileCheckError):
+            list(scanned_checker.iter_pages())
+
+    def test_expected_pages_known_before_reading(self):
+        pdf_checker = FileChecker(self.test_files_dir['pdf-summary'][1], self.max_pages)
+        pdf_pages = pdf_checker.iter_pages()
+        self.assertEqual(pdf_checker.expected_pages, len(list(pdf_pages)))
+
+        docx_checker = FileChecker(self.test_files_dir['docx'][0], self.max_pages)
+        docx_pages = docx_checker.iter_pages()
+        self.assertEqual(docx_checker.expected_pages, 8)  # From docProps/app.xml
+        first_page, _ = next(docx_pages)
+        self.assertEqual((first_page, docx_checker.total_pages), (1, 1))
+        docx_pages.close()
+
+    def test_docx_page_counts_and_early_stop(self):
+        data_science, _, india, _ = self.test_files_dir['docx']
+        file_checker = FileChecker(data_science, self.max_pages)
+        self.assertTrue(file_checker.check_file()[0])
+        self.assertEqual(file_checker.total_pages, 8)
+
+        # Streaming alone stops at the first page past the limit
+        pages = []
+        limited_checker = FileChecker(india, max_pages=10)
+        with self.assertRaises(FileCheckError):
+            for page_number, _ in limited_checker.iter_docx_pages():
+                pages.append(page_number)
+        self.assertEqual(pages, list(range(1, 11)))
+
+    def test_preflight_rejects_from_metadata(self):
+        india = self.test_files_dir['docx'][2]
+        preflight = FileChecker(india, max_pages=10).preflight()
+        self.assertFalse(preflight.accepted)
+        self.assertEqual(preflight.message, "DOCX exceeds 10 pages.")
+        self.assertEqual(preflight.pages, 48)
+        self.assertEqual(FileChecker(india, max_pages=10).check_file(), (False, "DOCX exceeds 10 pages."))
+
+        school = self.test_files_dir['pdf'][3]
+        preflight = FileChecker(school, self.max_pages).preflight()
+        self.assertTrue(preflight.accepted)
+        # The file name says 23 pages but the PDF has 24; trust the document
+        with fitz.open(school) as doc:
+            self.assertEqual(preflight.pages, len(doc))
+        self.assertEqual(preflight.estimated_cost, preflight.pages)
+        self.assertFalse(FileChecker("notes.txt").preflight().accepted)
+
+    @unittest.skipUnless(ocr_available(), "pytesseract or Tesseract is not installed")
+    def test_scanned_pdf_with_ocr(self):
+        file_name = os.path.join(SCRIPT_DIR, "documents", "pdf", "Scanned.pdf")
+        with tempfile.TemporaryDirectory() as cache_dir:
+            for run in range(2):  # The second run is served from the OCR cache
+                with self.subTest(run=run):
+                    file_checker = FileChecker(file_name, self.max_pages, ocr=True, ocr_cache_dir=cache_dir)
+                    is_valid, message = file_checker.check_file()
+                    self.assertNotIn("scanned image", message)
+            self.assertTrue(os.listdir(cache_dir))
+
+    def test_parallel_pdf_decoding_matches_serial(self):
+        file_name = self.test_files_dir['pdf-summary'][2]
+        serial_checker = FileChecker(file_name, self.max_pages)
+        parallel_checker = FileChecker(file_name, self.max_pages, n_processes=4)
+        parallel_checker.parallel_min_pages = 1
+        self.assertEqual(serial_checker.check_file(), parallel_checker.check_file())
+        self.assertEqual(
+            serial_checker.extracted_text.getvalue(),
+            parallel_checker.extracted_text.getvalue(),
+        )
+
+    def test_workers_do_not_import_torch(self):
+        # Pool workers import this module, so it must stay cheap to import
+        code = "import sys, extraction; print('torch' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], cwd=os.path.join(SCRIPT_DIR, "app"),
+                                capture_output=True, text=True, check=True)
+        self.assertEqual(result.stdout.split()[-1], "False")
+
+    def drift_texts(self):
+        texts = []
+        for file_name in self.test_files_dir['pdf-summary'] + self.test_files_dir['docx-summary']:
+            file_checker = FileChecker(file_name, self.max_pages)
+            is_valid, message = file_checker.check_file()
+            self.assertTrue(is_valid, message)
+            texts.append(file_checker.extracted_text.getvalue()[:3000])
+        return texts
+
+    def test_quantized_backend_drift(self):
+        # The int8 backend must stay close to the FP32 summaries on the corpus
+        scores = measure_backend_drift(self.drift_texts(), "int8")
+        print(f"int8 drift (unigram F1 vs FP32): {[round(score, 2) for score in scores]}")
+        self.assertGreaterEqual(sum(scores) / len(scores), 0.6)
+
+    def test_exported_backend_drift(self):
+        try:
+            import optimum.onnxruntime  # noqa: F401
+        except ImportError:
+            self.skipTest("optimum[onnxruntime] is not installed")
+        with tempfile.TemporaryDirectory() as cache_dir:
+            backend = ExportedGraphBackend(cache_dir)
+            scores = measure_backend_drift(self.drift_texts(), backend)
+            print(f"onnx drift (unigram F1 vs FP32): {[round(score, 2) for score in scores]}")
+            self.assertGreaterEqual(sum(scores) / len(scores), 0.8)
+            # The export is kept, so the next load skips it
+            self.assertTrue(os.path.isdir(backend.export_dir(BART_MODEL_NAME)))
+
+    def test_chunks_fit_model_budget(self):
+        file_checker = FileChecker(self.test_files_dir['pdf-summary'][2], self.max_pages)
+        is_valid, message = file_checker.check_file()
+        self.assertTrue(is_valid, message)
+        text = file_checker.extracted_text.getvalue()
+
+        _, tokenizer = acquire_bart_tokenizer()
+        chunker = TokenAwareChunker(tokenizer)
+        chunks = chunker.chunk(text)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(chunk.n_tokens, chunker.max_tokens)
+            self.assertIn(chunk.text.split("\n\n")[0], text[chunk.start:chunk.end])
+
     def test_summarization(self):
         # Define target word counts based on the provided logic
         target_word_counts = {
@@ -131,6 +277,676 @@ class TestFileChecker(unittest.TestCase):
                 elif summary_level == 'long':
                     self.assertLessEqual(summary_word_count, target_word_count, "Summary length exceeds the maximum for long summaries")
 
+    def test_hierarchical_summarization(self):
+        file_checker = FileChecker(self.test_files_dir['pdf-summary'][2], max_pages=None)
+        is_valid, message = file_checker.check_file()
+        self.assertTrue(is_valid, message)
+        text = TextPreprocessor.sentence_preserving().preprocess(file_checker.extracted_text.getvalue())
+
+        pipeline = SummarizationPipeline(cache=None)
+        try:
+            summary = pipeline.summarize(text, "short", mode="hierarchical")
+        finally:
+            pipeline.close()
+        self.assertNotEqual(summary, SUMMARIZATION_ERROR)
+
+        counters = pipeline.last_report.counters
+        sections = counters["sections"]
+        self.assertGreater(sections, 1)
+        target_word_count = pipeline.target_word_count(counters["input_words"], "short")
+        self.assertLessEqual(len(summary.split()), target_word_count)
+        # Leaves take one call per batch of 8, and every reduce level at
+        # least halves the summaries, so calls stay linear in the sections
+        max_calls = 2 * math.ceil(sections / 8) + math.ceil(math.log2(sections)) + 1
+        self.assertLessEqual(counters["generate_calls"], max_calls)
+
+    def test_summarize_pages_streams_extraction(self):
+        preprocessor = TextPreprocessor.sentence_preserving()
+        pipeline = SummarizationPipeline(cache=None)
+        try:
+            file_checker = FileChecker(self.test_files_dir['pdf-summary'][1], self.max_pages)
+            summary = pipeline.summarize_pages(file_checker.iter_pages(), "short",
+                                               preprocess=preprocessor.preprocess)
+            self.assertNotEqual(summary, SUMMARIZATION_ERROR)
+            stages = pipeline.last_report.stages
+            self.assertEqual(stages["extraction"]["calls"], file_checker.total_pages + 1)
+            self.assertEqual(stages["preprocess"]["calls"], file_checker.total_pages)
+
+            # Validation errors from the page source propagate
+            with self.assertRaises(FileCheckError):
+                pipeline.summarize_pages(FileChecker(self.test_files_dir['pdf'][2]).iter_pages(), "short")
+        finally:
+            pipeline.close()
+
+
+class TestLanguageVerifier(unittest.TestCase):
+
+    ENGLISH = ("The committee reviewed the annual report and agreed that the new schedule "
+               "should be published before the end of the month, so that every department "
+               "has enough time to prepare its budget and staffing plans. ") * 3
+
+    def tearDown(self):
+        LanguageVerifier.clear_cache()
+
+    def verify(self, verifier, document_key):
+        verifier.reset(document_key, total_pages=1)
+        cached = verifier.decided
+        verifier.check_page(1, self.ENGLISH)
+        return verifier.finish(), cached
+
+    def test_verdicts_depend_on_settings(self):
+        LanguageVerifier.clear_cache()
+        self.assertEqual(self.verify(LanguageVerifier(), "report"), (True, False))
+        self.assertEqual(self.verify(LanguageVerifier(), "report"), (True, True))
+        # An English verdict says nothing about a Spanish check
+        self.assertEqual(self.verify(LanguageVerifier(language="es"), "report"), (False, False))
+        self.assertEqual(self.verify(LanguageVerifier(confidence=0.5), "report"), (True, False))
+
+    def test_verdict_cache_is_bounded(self):
+        LanguageVerifier.clear_cache()
+        with mock.patch.object(LanguageVerifier, "max_cached_verdicts", 2):
+            for document_key in ["first", "second", "first", "third"]:
+                self.verify(LanguageVerifier(), document_key)
+            self.assertEqual(len(LanguageVerifier._verdicts), 2)
+            # "second" was the least recently used
+            self.assertEqual(self.verify(LanguageVerifier(), "second"), (True, False))
+            self.assertEqual(self.verify(LanguageVerifier(), "third"), (True, True))
+
+
+class TestModelRegistry(unittest.TestCase):
+
+    def test_shared_load_and_eviction(self):
+        registry = ModelRegistry()
+        loads = []
+
+        def loader():
+            loads.append(1)
+            return object()
+
+        first = registry.acquire("model", loader)
+        second = registry.acquire("model", loader)
+        self.assertIs(first, second)
+        self.assertEqual(len(loads), 1)
+        self.assertEqual(registry.refcount("model"), 2)
+
+        registry.release("model")
+        self.assertEqual(registry.evict("model"), [])
+        registry.release("model")
+        self.assertEqual(registry.evict("model"), ["model"])
+        self.assertEqual(registry.loaded(), [])
+
+
+class TestSummaryCache(unittest.TestCase):
+
+    def test_lru_eviction(self):
+        with tempfile.TemporaryDirectory() as cache_dir:
+            cache = SummaryCache(os.path.join(cache_dir, "cache.sqlite3"), max_bytes=60)
+            cache.set("first", "a" * 20)
+            time.sleep(0.01)
+            cache.set("second", "b" * 20)
+            time.sleep(0.01)
+            self.assertEqual(cache.get("first"), "a" * 20)
+            time.sleep(0.01)
+            cache.set("third", "c" * 20)
+
+            self.assertIsNotNone(cache.get("first"))
+            self.assertIsNone(cache.get("second"))
+            self.assertIsNotNone(cache.get("third"))
+
+
+class TestLengthPlanning(unittest.TestCase):
+
+    def test_budgets_fit_document_target(self):
+        importances = [3.0, 0.5, 1.2, 2.0]
+        budgets = SummarizationPipeline.plan_section_budgets(importances, len(importances), 400)
+        self.assertLessEqual(sum(budgets), 400)
+        self.assertEqual(budgets.index(max(budgets)), 0)
+
+        budgets = SummarizationPipeline.plan_section_budgets([1.0, 1.0], 2, 400)
+        self.assertEqual(budgets, [200, 200])
+
+    def test_many_sections_fit_document_target(self):
+        # Enough sections that the 30-word floor alone would exceed the target
+        for importances in ([1.0] * 10, [1.0] * 20, [0.5, 2.0] * 15):
+            with self.subTest(sections=len(importances)):
+                budgets = SummarizationPipeline.plan_section_budgets(importances, len(importances), 250)
+                self.assertLessEqual(sum(budgets), 250)
+                self.assertGreaterEqual(min(budgets), min(30, 250 // len(importances)))
+
+        # Sections pinned to the floor leave the rest to the important ones
+        budgets = SummarizationPipeline.plan_section_budgets([0.5] * 8 + [2.0] * 2, 10, 360)
+        self.assertEqual(budgets, [30] * 8 + [60, 60])
+
+    def test_verification_respects_budget(self):
+        fact_checker = ImprovedFactChecker()
+        original = " ".join(f"Sentence number {i} talks about topic {i} in detail." for i in range(40))
+        summary = "The document lists forty numbered topics."
+        try:
+            verified = fact_checker.verify(summary, original, max_words=30)
+            self.assertLessEqual(len(verified.split()), 30)
+            self.assertTrue(verified.startswith(summary))
+            self.assertGreater(len(fact_checker.verify(summary, original).split()), 30)
+        finally:
+            fact_checker.close()
+
+    def test_no_second_length_pass(self):
+        file_checker = FileChecker(os.path.join(SCRIPT_DIR, "documents", "pdf", "Video-Games-9-page.pdf"))
+        is_valid, message = file_checker.check_file()
+        self.assertTrue(is_valid, message)
+        text = TextPreprocessor.sentence_preserving().preprocess(file_checker.extracted_text.getvalue())
+
+        pipeline = SummarizationPipeline(cache=None)
+        batches = []
+        summarize_batch = pipeline.abstractive_summarizer.summarize_batch
+        def counting_batch(texts, *args, **kwargs):
+            batches.append(len(texts))
+            return summarize_batch(texts, *args, **kwargs)
+        pipeline.abstractive_summarizer.summarize_batch = counting_batch
+        try:
+            pipeline.summarize(text, "short")
+        finally:
+            pipeline.close()
+
+        counters = pipeline.last_report.counters
+        # One batched pass over the sections, with no re-summarization after
+        # fact checking
+        self.assertEqual(batches, [counters["sections"]])
+        self.assertLessEqual(counters["generate_calls"], counters["sections"])
+
+
+class TestPipelineProfiler(unittest.TestCase):
+
+    def test_report_and_chrome_trace(self):
+        profiler = PipelineProfiler()
+        for _ in profiler.timed_iter(range(3), "sectioning"):
+            with profiler.stage("generate", batch=2):
+                profiler.count("generate_calls")
+        report = profiler.finish()
+
+        stages = report.as_dict()["stages"]
+        self.assertEqual(stages["generate"]["calls"], 3)
+        self.assertEqual(stages["sectioning"]["calls"], 4)
+        self.assertEqual(report.counters, {"generate_calls": 3})
+
+        with tempfile.TemporaryDirectory() as trace_dir:
+            trace_path = os.path.join(trace_dir, "trace.json")
+            report.write_chrome_trace(trace_path)
+            with open(trace_path, encoding="utf-8") as trace_file:
+                events = json.load(trace_file)["traceEvents"]
+        self.assertEqual(len(events), 7)
+        self.assertTrue(all(event["ph"] == "X" and event["dur"] >= 0 for event in events))
+
+        disabled = PipelineProfiler(enabled=False)
+        with disabled.stage("generate"):
+            disabled.count("generate_calls")
+        self.assertEqual(disabled.finish().as_dict()["stages"], {})
+
+    def test_peak_rss_is_per_run(self):
+        first = PipelineProfiler()
+        if first.peak_rss is None:
+            self.skipTest("resident memory cannot be read on this platform")
+        with first.stage("generate"):
+            ballast = b"x" * (128 * 2**20)
+        del ballast
+        first_report = first.finish()
+        second_report = PipelineProfiler().finish()
+
+        # A later run does not inherit the earlier, larger peak
+        self.assertGreater(first_report.peak_rss - second_report.peak_rss, 64 * 2**20)
+        self.assertGreater(second_report.process_peak_rss - second_report.peak_rss, 64 * 2**20)
+
+
+class TestTextPreprocessor(unittest.TestCase):
+
+    def test_default_rules_match_character_filter(self):
+        text = "".join(chr(c) for c in range(0x3000)) + "Ünïcödé_snake_case, ½ ² ٣ and ﬁ!\n\nNext."
+        expected = "".join(char for char in text.lower() if char.isalnum() or char.isspace())
+        self.assertEqual(TextPreprocessor().preprocess(text), expected)
+
+    def test_sentence_preserving_rules(self):
+        preprocessor = TextPreprocessor.sentence_preserving()
+        self.assertEqual(preprocessor.preprocess("INTRODUCTION:\nIt works (mostly)! Right?"),
+                         "INTRODUCTION\nIt works mostly! Right?")
+        self.assertEqual(TextPreprocessor(case="casefold").preprocess("Straße"), "strasse")
+        with self.assertRaises(ValueError):
+            TextPreprocessor(punctuation="some")
+
+    def test_persistent_pool_matches_serial(self):
+        preprocessor = TextPreprocessor.sentence_preserving()
+        preprocessor.parallel_min_chars = 0
+        preprocessor.min_task_bytes = 1
+        text = "\n\n".join(f"Paragraph {i}: Some (text), here!" for i in range(200))
+        try:
+            self.assertEqual(preprocessor.process_in_parallel(text, 2), preprocessor.preprocess(text))
+            pool = preprocessor._pool
+            self.assertEqual(preprocessor.process_in_parallel(text, 2), preprocessor.preprocess(text))
+            self.assertIs(preprocessor._pool, pool)
+        finally:
+            preprocessor.shutdown()
+        self.assertIsNone(preprocessor._pool)
+
+
+class TestProgressMonitor(unittest.TestCase):
+
+    def test_progress_eta_and_cancellation(self):
+        updates = []
+        cancel_event = threading.Event()
+        monitor = ProgressMonitor(updates.append, cancel_event)
+        monitor.set_stage("generating")
+        monitor.add_work(4, 400)
+        monitor.generated(2, 100, 5.0)
+
+        self.assertEqual(updates[-1].sections_done, 2)
+        self.assertEqual(updates[-1].sections_total, 4)
+        self.assertEqual(updates[-1].generate_calls, 1)
+        self.assertAlmostEqual(updates[-1].eta_seconds, 15.0)
+
+        cancel_event.set()
+        self.assertTrue(monitor.stopping_criteria()[0](None, None))
+        with self.assertRaises(SummarizationCancelled):
+            monitor.generated(2, 300, 5.0)
+
+
+class TestBenchmark(unittest.TestCase):
+
+    def test_baseline_comparison(self):
+        def results(pages_per_second, seconds):
+            return {"documents": [{
+                "file": "documents/pdf/School-23-page.pdf",
+                "extraction": {"pages_per_second": pages_per_second},
+                "preprocessing": {"mb_per_second": 5.0},
+                "summaries": {"short": {"seconds": seconds, "profile": {"peak_rss_mb": 900.0}}},
+            }]}
+
+        baseline = results(100.0, 20.0)
+        self.assertEqual(compare_to_baseline(results(95.0, 21.0), baseline, 0.1), [])
+        regressions = compare_to_baseline(results(50.0, 30.0), baseline, 0.1)
+        self.assertEqual([name.split(" ", 1)[1] for name, _, _, _ in regressions],
+                         ["extraction.pages_per_second", "short seconds"])
+
+    def test_cold_levels_evict_models(self):
+        from app.SummaryEngine import model_registry
+
+        model_registry.acquire("benchmark-test", object)
+        model_registry.release("benchmark-test")
+        evict_models()
+        self.assertNotIn("benchmark-test", model_registry.loaded())
+
+
+class StreamingPipelineStub:
+    # Stands in for SummarizationPipeline in BatchRunner and service tests:
+    # consumes the pages the way summarize_pages does, without loading any model.
+    def __init__(self, cache=None, backend="torch"):
+        self.page_numbers = []
+
+    def summarize(self, text, target_length="medium", mode="sections", progress=None, cancel_event=None):
+        self.last_report = PipelineProfiler().finish()
+        return f"{target_length} summary of {len(text.split())} words"
+
+    def summarize_pages(self, pages, target_length="medium", mode="sections", progress=None, cancel_event=None,
+                        preprocess=None):
+        profiler = PipelineProfiler()
+        texts = []
+        try:
+            for page_number, text in profiler.timed_iter(pages, "extraction"):
+                self.page_numbers.append(page_number)
+                with profiler.stage("preprocess"):
+                    texts.append(preprocess(text))
+        finally:
+            self.last_report = profiler.finish()
+        return " ".join(texts)[:500]
+
+    def close(self):
+        pass
+
+
+class TestBatch(unittest.TestCase):
+
+    def test_process_file_streams_pages(self):
+        documents = os.path.join(SCRIPT_DIR, "documents", "pdf")
+        with tempfile.TemporaryDirectory() as output_dir, \
+                mock.patch("batch.SummarizationPipeline", StreamingPipelineStub):
+            runner = BatchRunner(output_dir, workers=1, use_cache=False)
+            pipeline = runner.pipelines.queue[0]
+
+            video_games = os.path.join(documents, "Video-Games-9-page.pdf")
+            self.assertTrue(runner.process_file(video_games))
+            entry = runner.manifest.entries[video_games]
+            self.assertEqual(entry["status"], "ok")
+            self.assertEqual(pipeline.page_numbers, list(range(1, entry["pages"] + 1)))
+            self.assertIn("extraction", entry["profile"]["stages"])
+            with open(entry["output"], encoding="utf-8") as output_file:
+                self.assertTrue(output_file.read())
+
+            scanned = os.path.join(documents, "Scanned.pdf")
+            self.assertFalse(runner.process_file(scanned))
+            self.assertIn("scanned image", runner.manifest.entries[scanned]["error"])
+            runner.max_pages = 10
+            too_long = os.path.join(documents, "WW2-42-page.pdf")
+            self.assertFalse(runner.process_file(too_long))
+            self.assertEqual(runner.manifest.entries[too_long]["error"], "PDF exceeds 10 pages.")
+            runner.close()
+
+    def test_collect_files(self):
+        with tempfile.TemporaryDirectory() as root:
+            for name in ["a.pdf", "b.DOCX", "notes.txt", os.path.join("nested", "c.doc")]:
+                os.makedirs(os.path.dirname(os.path.join(root, name)), exist_ok=True)
+                open(os.path.join(root, name), "w").close()
+            expected = sorted(os.path.join(root, name) for name in ["a.pdf", "b.DOCX", os.path.join("nested", "c.doc")])
+            self.assertEqual(collect_files([root]), expected)
+            self.assertEqual(collect_files([os.path.join(root, "*.pdf"), root]), expected)
+            self.assertEqual(collect_files([os.path.join(root, "missing")]), [])
+
+    def test_output_names_are_unique(self):
+        paths = [
+            os.path.join("x", "report.pdf"),
+            os.path.join("x", "report.docx"),
+            os.path.join("a", "reports", "x.pdf"),
+            os.path.join("b", "reports", "x.pdf"),
+        ]
+        names = [output_name(path) for path in paths]
+        self.assertEqual(len(set(names)), len(paths))
+        self.assertEqual(names[0], output_name(os.path.abspath(paths[0])))
+        self.assertTrue(names[0].startswith("x__report.pdf_"))
+
+    def test_manifest_resume(self):
+        with tempfile.TemporaryDirectory() as root:
+            manifest_path = os.path.join(root, "manifest.json")
+            output_path = os.path.join(root, "done.txt")
+            open(output_path, "w").close()
+            manifest = Manifest(manifest_path)
+            manifest.record("done.pdf", {"status": "ok", "output": output_path})
+            manifest.record("failed.pdf", {"status": "failed", "output": None})
+            manifest.record("deleted.pdf", {"status": "ok", "output": os.path.join(root, "gone.txt")})
+
+            manifest.close()
+
+            resumed = Manifest(manifest_path, resume=True)
+            self.assertTrue(resumed.is_done("done.pdf"))
+            self.assertFalse(resumed.is_done("failed.pdf"))
+            self.assertFalse(resumed.is_done("deleted.pdf"))
+            resumed.close()
+            fresh = Manifest(manifest_path)
+            self.assertFalse(fresh.is_done("done.pdf"))
+            fresh.close()
+
+    def test_manifest_journal(self):
+        with tempfile.TemporaryDirectory() as root:
+            manifest_path = os.path.join(root, "manifest.json")
+            manifest = Manifest(manifest_path)
+            manifest.write_every = 3
+            manifest.record("a.pdf", {"status": "failed", "output": None, "profile": {"stages": {}}})
+            manifest.record("b.pdf", {"status": "failed", "output": None})
+            # Records only go to the journal until write_every is reached
+            with open(manifest_path, encoding="utf-8") as manifest_file:
+                self.assertEqual(json.load(manifest_file)["files"], {})
+            with open(manifest.journal_path, encoding="utf-8") as journal:
+                self.assertEqual([json.loads(line)["file"] for line in journal], ["a.pdf", "b.pdf"])
+            manifest.record("c.pdf", {"status": "failed", "output": None})
+            with open(manifest_path, encoding="utf-8") as manifest_file:
+                self.assertEqual(sorted(json.load(manifest_file)["files"]), ["a.pdf", "b.pdf", "c.pdf"])
+            self.assertEqual(os.path.getsize(manifest.journal_path), 0)
+
+            # An interrupted run: one more record and a torn line, never compacted
+            manifest.record("d.pdf", {"status": "failed", "output": None})
+            manifest._journal.write('{"file": "e.pdf", "ent')
+            manifest._journal.flush()
+            resumed = Manifest(manifest_path, resume=True)
+            self.assertEqual(sorted(resumed.entries), ["a.pdf", "b.pdf", "c.pdf", "d.pdf"])
+            resumed.record("e.pdf", {"status": "failed", "output": None})
+            resumed.close()
+            manifest._journal.close()
+            with open(manifest_path, encoding="utf-8") as manifest_file:
+                self.assertEqual(len(json.load(manifest_file)["files"]), 5)
+
+
+class TestService(unittest.IsolatedAsyncioTestCase):
+
+    async def asyncSetUp(self):
+        with mock.patch("service.SummarizationPipeline", StreamingPipelineStub):
+            self.service = SummarizationService(workers=1, queue_size=1, use_cache=False)
+        # No worker drains the queue unless a test starts one
+        self.service.queue = asyncio.Queue(maxsize=self.service.queue_size)
+        self.server = await asyncio.start_server(self.service._handle_connection, "127.0.0.1", 0)
+        self.port = self.server.sockets[0].getsockname()[1]
+
+    async def asyncTearDown(self):
+        self.server.close()
+        await self.server.wait_closed()
+        self.service.executor.shutdown()
+
+    async def request(self, method, path, payload=None, body=None):
+        if payload is not None:
+            body = json.dumps(payload).encode("utf-8")
+        body = body or b""
+        reader, writer = await asyncio.open_connection("127.0.0.1", self.port)
+        writer.write(f"{method} {path} HTTP/1.1\r\nContent-Length: {len(body)}\r\n\r\n".encode("latin-1") + body)
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        head, _, response_body = response.partition(b"\r\n\r\n")
+        lines = head.decode("latin-1").split("\r\n")
+        headers = dict(line.split(": ", 1) for line in lines[1:])
+        return int(lines[0].split(" ")[1]), headers, json.loads(response_body)
+
+    async def test_submit_and_queue_full(self):
+        status, _, job = await self.request("POST", "/jobs", {"text": "Some text to summarize.", "level": "short"})
+        self.assertEqual((status, job["status"]), (202, "queued"))
+
+        status, headers, error = await self.request("POST", "/jobs", {"text": "More text."})
+        self.assertEqual(status, 503)
+        self.assertEqual(headers["Retry-After"], "30")
+        self.assertIn("queue is full", error["error"])
+
+        status, _, error = await self.request("GET", f"/jobs/{job['id']}/result")
+        self.assertEqual(status, 409)
+
+    async def test_cancel_queued_job(self):
+        _, _, job = await self.request("POST", "/jobs", {"text": "Some text to summarize."})
+        status, _, cancelled = await self.request("DELETE", f"/jobs/{job['id']}")
+        self.assertEqual((status, cancelled["status"]), (202, "cancelled"))
+        status, _, _ = await self.request("DELETE", f"/jobs/{job['id']}")
+        self.assertEqual(status, 409)
+
+        # The worker skips the cancelled job and runs the next one
+        worker = asyncio.create_task(self.service._worker(self.service.pipelines[0]))
+        try:
+            await asyncio.wait_for(self.service.queue.join(), 10)
+            _, _, job = await self.request("POST", "/jobs", {"text": "Four words of text.", "level": "long"})
+            await asyncio.wait_for(self.service.queue.join(), 10)
+        finally:
+            worker.cancel()
+        status, _, result = await self.request("GET", f"/jobs/{job['id']}/result")
+        self.assertEqual((status, result["summary"]), (200, "long summary of 4 words"))
+
+    async def test_bad_payloads(self):
+        for payload in [{"path": 5}, {"text": 5}, {"text": ""}, {"text": "x", "path": "y.pdf"}, {},
+                        {"text": "x", "level": ["short"]}, {"text": "x", "mode": 1}, {"text": "x", "level": "huge"},
+                        {"path": "missing.pdf"}, ["text"]]:
+            with self.subTest(payload=payload):
+                status, _, error = await self.request("POST", "/jobs", payload)
+                self.assertEqual(status, 400)
+                self.assertIn("error", error)
+        status, _, _ = await self.request("POST", "/jobs", body=b"{not json")
+        self.assertEqual(status, 400)
+        self.assertEqual(self.service.jobs, {})
+
+    async def test_routing(self):
+        self.assertEqual((await self.request("GET", "/health"))[0], 200)
+        self.assertEqual((await self.request("GET", "/jobs/unknown"))[0], 404)
+        self.assertEqual((await self.request("GET", "/nowhere"))[0], 404)
+        self.assertEqual((await self.request("GET", "/jobs"))[0], 405)
+        self.assertEqual((await self.request("PUT", "/health"))[0], 405)
+        with mock.patch.object(self.service, "route", side_effect=RuntimeError("boom")):
+            status, _, error = await self.request("GET", "/health")
+        self.assertEqual((status, error["error"]), (500, "Internal server error."))
+
+
+class TestFactChecker(unittest.TestCase):
+
+    def test_blockwise_coverage_matches_full_matrix(self):
+        rng = np.random.default_rng(0)
+        summary_vectors = rng.normal(size=(7, 16))
+        original_vectors = rng.normal(size=(50, 16))
+
+        full = ImprovedFactChecker.uncovered_mask(summary_vectors, original_vectors, 0.3)
+        blocked = ImprovedFactChecker.uncovered_mask(summary_vectors, original_vectors, 0.3, block_size=8)
+        similarity = summary_vectors @ original_vectors.T
+        similarity /= np.outer(np.linalg.norm(summary_vectors, axis=1), np.linalg.norm(original_vectors, axis=1))
+        expected = [not any(similarity[j][i] > 0.3 for j in range(7)) for i in range(50)]
+
+        self.assertEqual(full.tolist(), expected)
+        self.assertEqual(blocked.tolist(), expected)
+
+
+class CountingSentenceModel:
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, sentences, batch_size=32):
+        self.encoded.extend(sentences)
+        return np.array([[len(sentence), sentence.count(" ") + 1.0] for sentence in sentences])
+
+
+class FirstSentenceSummarizer:
+    def summarize_batch(self, texts, max_lengths, min_lengths, tech_terms=None):
+        return [text.split(". ")[0] + "." for text in texts]
+
+
+def split_sentences(text):
+    return [sentence if sentence.endswith(".") else sentence + "." for sentence in text.split(". ") if sentence]
+
+
+def tag_sentences(sentences):
+    # Stand-in tagger: words ending in "ing" are verbs, everything else nouns
+    return [[(word, "VBG" if word.endswith("ing") else "NN") for word in sentence] for sentence in sentences]
+
+
+class TestTechnicalTerms(unittest.TestCase):
+
+    texts = [
+        "Transistor gates switch current. Transistor leakage grows as gates shrink while switching.",
+        "Routing connects cells. Routing congestion delays timing closure and routing tools retry.",
+        "Placement spreads cells evenly before routing starts.",
+    ]
+
+    def test_document_terms_ranked_per_section(self):
+        extractor = ImprovedTechnicalTermExtractor()
+        with mock.patch("app.SummaryEngine.pos_tag_sents", tag_sentences):
+            terms = extractor.extract_document(self.texts, top_n=4)
+
+        # Expected: each section's own TF-IDF ranking, verbs dropped, top 4
+        matrix = extractor.vectorizer.fit_transform(self.texts).toarray()
+        names = extractor.vectorizer.get_feature_names_out()
+        self.assertEqual(len(terms), len(self.texts))
+        for row, section_terms in zip(matrix, terms):
+            ranked = [names[i] for i in np.argsort(-row, kind="stable") if row[i] > 0]
+            nouns = [term for term in ranked if len(term.split()) > 1 or not term.endswith("ing")]
+            self.assertEqual(section_terms, nouns[:4])
+        self.assertTrue(all(len(section_terms) == 4 for section_terms in terms))
+
+    def test_empty_vocabulary(self):
+        extractor = ImprovedTechnicalTermExtractor()
+        self.assertEqual(extractor.extract_document(["the and of", "", "is it"]), [[], [], []])
+
+    def test_batch_tagging_matches_single(self):
+        from nltk import pos_tag
+        terms = ["routing", "transistor", "switch", "grows", "quickly", "timing closure", "cells", "evenly"]
+        filtered = ImprovedTechnicalTermExtractor().filter_terms(terms)
+        expected = [term for term in terms if len(term.split()) > 1 or pos_tag([term])[0][1].startswith("NN")]
+        self.assertEqual(filtered, expected)
+
+
+class ItemTokenizer:
+    # Each text "item <n>" becomes the single token n + 1; 0 is padding
+    pad_token_id = 0
+
+    def __call__(self, texts, **kwargs):
+        input_ids = torch.tensor([[int(text.split()[1]) + 1] for text in texts])
+        return {"input_ids": input_ids, "attention_mask": torch.ones_like(input_ids)}
+
+    def batch_decode(self, ids, skip_special_tokens=True):
+        return [f"summary {int(row[0]) - 1}" for row in ids]
+
+
+class RecordingModel:
+    def __init__(self):
+        self.calls = []
+
+    def generate(self, input_ids, max_length, **kwargs):
+        self.calls.append(([int(token) - 1 for token in input_ids[:, 0]], max_length))
+        return input_ids
+
+
+class TestBatchedGeneration(unittest.TestCase):
+
+    def test_buckets(self):
+        summarizer = ImprovedAbstractiveSummarizer.__new__(ImprovedAbstractiveSummarizer)
+        summarizer.tokenizer, summarizer.model = ItemTokenizer(), RecordingModel()
+        summarizer.profiler, summarizer.monitor = PipelineProfiler(enabled=False), ProgressMonitor()
+
+        rng = np.random.default_rng(0)
+        max_lengths = [int(length) for length in rng.integers(30, 300, size=40)]
+        texts = [f"item {i}" for i in range(len(max_lengths))]
+        summaries = summarizer.summarize_batch(texts, max_lengths, [length // 2 for length in max_lengths],
+                                               batch_size=8, length_tolerance=1.25)
+
+        self.assertEqual(summaries, [f"summary {i}" for i in range(len(texts))])
+        calls = summarizer.model.calls
+        self.assertLess(len(calls), len(texts))
+        self.assertEqual(sorted(i for bucket, _ in calls for i in bucket), list(range(len(texts))))
+        for bucket, max_length in calls:
+            self.assertLessEqual(len(bucket), 8)
+            for i in bucket:
+                self.assertLessEqual(max_length, max_lengths[i])
+                # The documented worst case: at most 20% of a budget is lost
+                self.assertGreaterEqual(max_length, max_lengths[i] / 1.25)
+
+
+class TestSentenceEncoding(unittest.TestCase):
+
+    def make_pipeline(self, cache):
+        # Only the parts summarize_sections and the postprocessor touch
+        model = CountingSentenceModel()
+        store = SentenceEmbeddingStore()
+        store.sentence_model = model
+        pipeline = SummarizationPipeline.__new__(SummarizationPipeline)
+        pipeline.bart_model, pipeline.sentence_model = BART_MODEL_NAME, "counting"
+        pipeline.backend = get_backend("torch")
+        pipeline.cache = cache
+        pipeline.embedding_store = store
+        pipeline.abstractive_summarizer = FirstSentenceSummarizer()
+        pipeline.fact_checker = ImprovedFactChecker(embedding_store=store)
+        pipeline.postprocessor = ImprovedPostprocessor(embedding_store=store)
+        pipeline.profiler = PipelineProfiler(enabled=False)
+        pipeline.monitor = ProgressMonitor()
+        return pipeline, model
+
+    def section(self, topic):
+        return " ".join(f"Point {i} about {topic} has {i + 3} words here." for i in range(6))
+
+    def test_one_encode_per_sentence(self):
+        contents = [self.section("rivers"), self.section("mountains")]
+        with tempfile.TemporaryDirectory() as cache_dir, \
+                mock.patch("app.SummaryEngine.sent_tokenize", split_sentences):
+            cache = SummaryCache(os.path.join(cache_dir, "cache.sqlite3"))
+            pipeline, model = self.make_pipeline(cache)
+            summaries = pipeline.summarize_sections(contents, [20, 20], prepared=[(c, []) for c in contents])
+            pipeline.postprocessor.extract_key_takeaways(list(zip(["a", "b"], summaries)))
+            # Verification and takeaways reuse the vectors of the one batched pass
+            self.assertEqual(sorted(model.encoded), sorted(set(model.encoded)))
+            expected = {sentence for text in contents + summaries for sentence in split_sentences(text)}
+            self.assertEqual(set(model.encoded), expected)
+
+            # A cached section is not encoded again
+            pipeline, model = self.make_pipeline(cache)
+            new_section = self.section("lakes")
+            pipeline.summarize_sections([contents[0], new_section], [20, 20],
+                                        prepared=[(contents[0], []), (new_section, [])])
+            self.assertEqual(len(model.encoded), len(set(model.encoded)))
+            self.assertFalse(set(model.encoded) & set(split_sentences(contents[0])))
+            self.assertTrue(set(split_sentences(new_section)) <= set(model.encoded))
+
 
 if __name__ == '__main__':
     unittest.main()